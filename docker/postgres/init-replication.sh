@@ -0,0 +1,10 @@
+#!/bin/sh
+# Runs once when the primary's data volume is created: adds the role the
+# db-replica service streams WAL with and allows it in pg_hba.conf.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE "${REPLICATION_USER:-replicator}" WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD:-replicator}';
+EOSQL
+
+echo "host replication ${REPLICATION_USER:-replicator} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
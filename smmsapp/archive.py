@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from .caching import bump_model_versions
+from .models import ScannedData, Notification
+
+# Archived datasets: model, date field the retention applies to, rows eligible, retention setting.
+# Rows are kept as gzip compressed JSON lines, one file per month of the date field:
+# ARCHIVE_ROOT/<dataset>/<YYYY-MM>.jsonl.gz
+ARCHIVE_DATASETS = {
+    'scanned_data': (ScannedData, 'scanned_at', {}, 'SCANNED_DATA_RETENTION_DAYS'),
+    'notifications': (Notification, 'created_at', {'status__in': ['sent', 'failed']}, 'NOTIFICATION_RETENTION_DAYS'),
+}
+
+
+def archive_path(dataset, month):
+    return os.path.join(settings.ARCHIVE_ROOT, dataset, f"{month}.jsonl.gz")
+
+
+def append_rows(path, rows):
+    """
+    Append rows as one gzip member and make it durable. The length of the file up to its
+    last complete member is kept next to it, so a member left partial by a crash is cut
+    off before the next append instead of hiding everything written after it.
+    """
+    marker = f"{path}.size"
+    with open(path, 'ab') as raw:
+        if os.path.exists(marker):
+            with open(marker) as size:
+                raw.truncate(int(size.read()))
+        # The member is complete (trailer written) once the gzip stream closes
+        with gzip.open(raw, 'wt', encoding='utf-8') as archive:
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+        committed = raw.tell()
+
+    with open(f"{marker}.tmp", 'w') as size:
+        size.write(str(committed))
+        size.flush()
+        os.fsync(size.fileno())
+    os.replace(f"{marker}.tmp", marker)
+
+
+# ---- MOVE OLD ROWS TO THE ARCHIVE -----
+def archive_dataset(dataset, cutoff, batch_size=None, dry_run=False):
+    """
+    Move rows older than `cutoff` to the archive files, batch_size rows at a time. Each batch
+    is appended to its month files before it is deleted in its own short transaction, so a
+    crash can at worst archive a batch twice, never lose it. Returns the rows archived.
+    """
+    model, date_field, conditions, _ = ARCHIVE_DATASETS[dataset]
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    rows = model.objects.filter(**{f"{date_field}__lt": cutoff}, **conditions).order_by(date_field)
+    if dry_run:
+        return rows.count()
+
+    archived = 0
+    while True:
+        batch = list(rows.values()[:batch_size])
+        if not batch:
+            break
+
+        by_month = {}
+        for row in batch:
+            by_month.setdefault(f"{timezone.localtime(row[date_field]):%Y-%m}", []).append(row)
+        for month, month_rows in by_month.items():
+            path = archive_path(dataset, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Every batch adds a gzip member, readers see one continuous stream
+            append_rows(path, month_rows)
+
+        with db_transaction.atomic():
+            # Nothing references these rows: skip the collector and its per row signals
+            model.objects.filter(pk__in=[row['id'] for row in batch])._raw_delete(model.objects.db)
+        archived += len(batch)
+
+    if archived:
+        bump_model_versions(model)
+    return archived
+
+
+def archive_old_data(dry_run=False, batch_size=None):
+    """Apply every dataset's retention setting (0 disables it). Returns {dataset: rows archived}."""
+    result = {}
+    for dataset, (_, _, _, setting) in ARCHIVE_DATASETS.items():
+        days = getattr(settings, setting)
+        if days:
+            result[dataset] = archive_dataset(dataset, timezone.now() - timedelta(days=days), batch_size, dry_run)
+    return result
+
+
+# ---- READ THE ARCHIVE -----
+def archived_months(dataset):
+    directory = os.path.join(settings.ARCHIVE_ROOT, dataset)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len('.jsonl.gz')] for name in os.listdir(directory) if name.endswith('.jsonl.gz'))
+
+
+class ArchiveCorrupt(Exception):
+    pass
+
+
+def query_archive(dataset, month, filters=None, offset=0, limit=50):
+    """
+    Stream one month of a dataset, keeping rows whose fields equal `filters`.
+    Returns (matching row count, rows[offset:offset + limit]). Raises ArchiveCorrupt when
+    the file is truncated or damaged.
+    """
+    if dataset not in ARCHIVE_DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}. Use one of {', '.join(ARCHIVE_DATASETS)}.")
+    path = archive_path(dataset, month)
+    if month not in archived_months(dataset):
+        raise FileNotFoundError(f"No {dataset} archive for {month}")
+
+    filters = {field: str(value) for field, value in (filters or {}).items()}
+    seen = set()
+    count = 0
+    rows = []
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                # A batch archived twice after a crash appears once
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                if any(str(row.get(field)) != value for field, value in filters.items()):
+                    continue
+                if offset <= count < offset + limit:
+                    rows.append(row)
+                count += 1
+    except (EOFError, gzip.BadGzipFile, zlib.error, UnicodeDecodeError, ValueError, KeyError) as e:
+        # A batch cut short by a crash is dropped by the next archive run, anything else needs the backup
+        raise ArchiveCorrupt(f"The {dataset} archive for {month} is truncated or damaged ({e.__class__.__name__})") from e
+    return count, rows
@@ -0,0 +1,47 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .caching import cached_user_key
+
+logger = logging.getLogger(__name__)
+
+
+# ---- JWT AUTHENTICATION WITH CACHED USERS -----
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's user in the cache for AUTH_USER_CACHE_TIMEOUT
+    seconds instead of loading it on every request. Saving or deleting the user and
+    logging out invalidate the entry. Inactive users are never cached.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        try:
+            key = cached_user_key(user_id)
+            user = cache.get(key)
+        except Exception as e:
+            logger.warning(f"User cache unavailable: {e}")
+            return super().get_user(validated_token)
+
+        if user is None:
+            user = super().get_user(validated_token)
+            try:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Could not cache user {user_id}: {e}")
+            return user
+
+        # Same revocation check as JWTAuthentication, the token may predate a password change
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,362 @@
+import csv
+import io
+import json
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from .caching import bump_model_versions
+from .models import CustomUser, School, ParentStudent, Notification, RFIDCard, BalanceLedger
+from .serializers.AuthSerializers import generate_password, student_username
+from .utils import allocate_control_numbers, card_created_notifications
+
+IMPORT_BATCH_SIZE = 1000
+# Below this many passwords a process pool costs more than it saves
+HASH_POOL_THRESHOLD = 50
+
+USER_COLUMNS = (
+    'role', 'first_name', 'middle_name', 'last_name', 'username', 'email', 'mobile_number',
+    'school', 'class_room', 'gender', 'parent_type', 'parents',
+)
+ROLES = {role for role, _ in CustomUser.ROLE_CHOICES}
+GENDERS = {gender for gender, _ in CustomUser.GENDER_CHOICES}
+PARENT_TYPES = {parent_type for parent_type, _ in CustomUser.PARENT_TYPE_CHOICES}
+# Longest value each text column fits, a longer one would abort the whole bulk insert
+MAX_LENGTHS = {
+    column: CustomUser._meta.get_field(column).max_length
+    for column in ('first_name', 'middle_name', 'last_name', 'username', 'email', 'mobile_number', 'class_room')
+}
+
+
+# ---- READ CSV / JSONL -----
+def read_user_rows(file, file_format):
+    """
+    Yield (row number, row dict) from a CSV (with header) or JSON lines file. A line that
+    is not valid JSON or not an object is yielded as None and reported as an error of its row.
+    """
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported format: {file_format}. Use 'csv' or 'jsonl'.")
+
+
+def clean_row(row):
+    cleaned = {}
+    for column in USER_COLUMNS:
+        value = row.get(column)
+        # JSON numbers and booleans are read as text, lists and objects are left for validate()
+        if isinstance(value, (int, float, bool)):
+            value = str(value)
+        if isinstance(value, str):
+            value = value.strip()
+        cleaned[column] = value if value not in ('', None) else None
+
+    # parents: "username;mobile;id" in CSV, or a list in JSONL
+    parents = cleaned['parents'] or []
+    if isinstance(parents, str):
+        parents = parents.split(';')
+    if isinstance(parents, list):
+        cleaned['parents'] = [str(ref).strip() for ref in parents if str(ref).strip()]
+    return cleaned
+
+
+def hash_passwords(passwords):
+    """make_password is deliberately slow, spread large batches over a process pool."""
+    if len(passwords) < HASH_POOL_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    try:
+        with ProcessPoolExecutor(max_workers=settings.IMPORT_HASH_WORKERS, initializer=django.setup) as pool:
+            return list(pool.map(make_password, passwords, chunksize=25))
+    except (AssertionError, BrokenProcessPool, OSError):
+        # e.g. inside a daemonic celery worker, which may not start children
+        return [make_password(password) for password in passwords]
+
+
+# ---- BULK USER IMPORT -----
+class UserImporter:
+    """
+    Validate user rows in memory against lookup sets loaded up front, then insert the
+    valid ones with bulk_create. Parents and staff are handled before students so that
+    students can name parents created in the same file.
+    """
+
+    def __init__(self, rows):
+        self.rows = []
+        self.errors = []
+        for number, row in rows:
+            if row is None:
+                self.error(number, 400, "Each line must be a JSON object.")
+            else:
+                self.rows.append((number, clean_row(row)))
+        self.users = []
+        self.passwords = []
+        self.links = []
+        self.load_lookups()
+
+    def load_lookups(self):
+        rows = [row for _, row in self.rows if self.has_text_values(row)]
+        usernames = {row['username'] for row in rows if row['username']}
+        usernames |= {student_username(row['first_name'], row['last_name'])
+                      for row in rows if row['role'] == 'student' and row['first_name'] and row['last_name']}
+        emails = {row['email'] for row in rows if row['email']}
+        mobiles = {row['mobile_number'] for row in rows if row['mobile_number']}
+
+        self.taken_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Compared case-insensitively, through the UPPER(email) index
+        self.taken_emails = {
+            email.lower() for email in CustomUser.objects.annotate(email_upper=Upper('email'))
+                                                   .filter(email_upper__in=[email.upper() for email in emails])
+                                                   .values_list('email', flat=True)
+        }
+        self.taken_mobiles = set(CustomUser.objects.filter(mobile_number__in=mobiles).values_list('mobile_number', flat=True))
+
+        # Schools are few, match them by id, number or name
+        self.schools = {}
+        for school in School.objects.all():
+            self.schools[str(school.id)] = school
+            if school.number is not None:
+                self.schools[str(school.number)] = school
+            self.schools[school.name.lower()] = school
+
+        # Existing parents referenced by username, mobile number or id
+        refs = {ref for row in rows for ref in row['parents']}
+        ids = [ref for ref in refs if self.is_uuid(ref)]
+        self.parents = {}
+        parents = CustomUser.objects.filter(role='parent').filter(
+            Q(username__in=refs) | Q(mobile_number__in=refs) | Q(id__in=ids)
+        ).only('id', 'username', 'mobile_number')
+        for parent in parents:
+            self.add_parent(parent)
+
+    @staticmethod
+    def has_text_values(row):
+        return all(value is None or isinstance(value, str) for column, value in row.items() if column != 'parents') \
+            and isinstance(row['parents'], list)
+
+    @staticmethod
+    def is_uuid(value):
+        try:
+            uuid.UUID(value)
+            return True
+        except ValueError:
+            return False
+
+    def add_parent(self, parent):
+        self.parents[str(parent.id)] = parent
+        self.parents[parent.username] = parent
+        if parent.mobile_number:
+            self.parents[parent.mobile_number] = parent
+
+    def error(self, row_number, code, message):
+        self.errors.append({'row': row_number, 'code': code, 'message': message})
+
+    def validate(self, row_number, row):
+        if not self.has_text_values(row):
+            return self.error(row_number, 400, "Values must be text or numbers, parents a list.")
+        for column, max_length in MAX_LENGTHS.items():
+            if row[column] and len(row[column]) > max_length:
+                return self.error(row_number, 400, f"{column} is longer than {max_length} characters.")
+
+        role = row['role']
+        if role not in ROLES:
+            return self.error(row_number, 400, f"Invalid role: {role}")
+        if not row['first_name'] or not row['last_name']:
+            return self.error(row_number, 400, "First name and last name are required.")
+        if row['gender'] and row['gender'] not in GENDERS:
+            return self.error(row_number, 400, f"Invalid gender: {row['gender']}")
+        if row['parent_type'] and row['parent_type'] not in PARENT_TYPES:
+            return self.error(row_number, 400, f"Invalid parent type: {row['parent_type']}")
+
+        username = student_username(row['first_name'], row['last_name']) if role == 'student' else row['username']
+        if not username:
+            return self.error(row_number, 400, "Username is required.")
+        if len(username) > MAX_LENGTHS['username']:
+            return self.error(row_number, 400, f"username is longer than {MAX_LENGTHS['username']} characters.")
+        if username in self.taken_usernames:
+            return self.error(row_number, 108, "This user is already exist")
+        if row['mobile_number'] and row['mobile_number'] in self.taken_mobiles:
+            return self.error(row_number, 122, "This mobile number is already exist")
+        if row['email'] and row['email'].lower() in self.taken_emails:
+            return self.error(row_number, 123, "This email is already exist")
+
+        school = None
+        if row['school']:
+            school = self.schools.get(row['school']) or self.schools.get(row['school'].lower())
+            if school is None:
+                return self.error(row_number, 400, f"Unknown school: {row['school']}")
+
+        parents = []
+        for ref in row['parents'] if role == 'student' else []:
+            if ref not in self.parents:
+                return self.error(row_number, 107, f"Invalid parent ID: {ref}")
+            parents.append(self.parents[ref])
+
+        return username, school, parents
+
+    def run(self, dry_run=False):
+        # Parents and staff first, so students can link to parents from the same file
+        ordered = sorted(self.rows, key=lambda item: item[1]['role'] == 'student')
+
+        for row_number, row in ordered:
+            result = self.validate(row_number, row)
+            if result is None:
+                continue
+            username, school, parents = result
+
+            user = CustomUser(
+                id=uuid.uuid4(),
+                role=row['role'],
+                username=username,
+                first_name=row['first_name'],
+                middle_name=row['middle_name'] or "",
+                last_name=row['last_name'],
+                email=row['email'] or "",
+                mobile_number=row['mobile_number'],
+                school=school,
+                class_room=row['class_room'],
+                gender=row['gender'] or 'M',
+                parent_type=row['parent_type'] or 'mother',
+            )
+            self.users.append(user)
+            # Students do not need a password
+            self.passwords.append(None if user.role == 'student' else generate_password(user.last_name))
+            self.links.extend(ParentStudent(parent=parent, student=user) for parent in parents)
+
+            # Later rows of the file must not reuse what this one took
+            self.taken_usernames.add(username)
+            if user.email:
+                self.taken_emails.add(user.email.lower())
+            if user.mobile_number:
+                self.taken_mobiles.add(user.mobile_number)
+            if user.role == 'parent':
+                self.add_parent(user)
+
+        self.errors.sort(key=lambda error: error['row'])
+        if not dry_run and self.users:
+            self.save()
+
+        return {
+            'created': 0 if dry_run else len(self.users),
+            'valid': len(self.users),
+            'errors': self.errors,
+        }
+
+    def save(self):
+        to_hash = [password for password in self.passwords if password is not None]
+        hashed = iter(hash_passwords(to_hash))
+        notifications = []
+        for user, password in zip(self.users, self.passwords):
+            if password is None:
+                continue
+            user.password = next(hashed)
+            notifications.append(Notification(
+                recipient=user,
+                title="Login Credentials",
+                type='reminder',
+                message=f"Hello {user.first_name}, your account was created successfully. Use username {user.username} and password {password}.",
+            ))
+
+        with db_transaction.atomic():
+            CustomUser.objects.bulk_create(self.users, batch_size=IMPORT_BATCH_SIZE)
+            ParentStudent.objects.bulk_create(self.links, batch_size=IMPORT_BATCH_SIZE)
+            Notification.objects.bulk_create(notifications, batch_size=IMPORT_BATCH_SIZE)
+
+        # bulk_create sends no post_save, invalidate cached responses by hand
+        bump_model_versions(CustomUser, ParentStudent, Notification)
+
+
+def import_users(file, file_format, dry_run=False):
+    return UserImporter(read_user_rows(file, file_format)).run(dry_run=dry_run)
+
+
+# ---- BULK RFID CARD ISSUANCE -----
+def issue_cards(entries):
+    """
+    Create cards for validated entries (BulkRFIDCardEntrySerializer data) in one go.
+    Owners, their existing cards, taken card numbers and parents are loaded up front;
+    control numbers are allocated once per school. Returns (cards, errors).
+    """
+    owner_ids = {entry['student_or_staff'] for entry in entries}
+    card_numbers = {entry['card_number'] for entry in entries}
+
+    owners = CustomUser.objects.filter(id__in=owner_ids, role__in=['student', 'staff']).select_related('school').in_bulk()
+    owners_with_card = set(RFIDCard.objects.filter(student_or_staff__in=owner_ids).values_list('student_or_staff_id', flat=True))
+    taken_numbers = set(RFIDCard.objects.filter(card_number__in=card_numbers).values_list('card_number', flat=True))
+
+    errors = []
+    accepted = []
+    for index, entry in enumerate(entries):
+        owner = owners.get(entry['student_or_staff'])
+        if owner is None:
+            errors.append({'index': index, 'code': 404, 'message': "Student or staff not found"})
+        elif owner.id in owners_with_card:
+            errors.append({'index': index, 'code': 112, 'message': "This student already have a card"})
+        elif entry['card_number'] in taken_numbers:
+            errors.append({'index': index, 'code': 105, 'message': "This card number already exists"})
+        elif owner.school is None:
+            errors.append({'index': index, 'code': 400, 'message': "Student or staff must belong to a school."})
+        else:
+            accepted.append((owner, entry))
+            owners_with_card.add(owner.id)
+            taken_numbers.add(entry['card_number'])
+
+    if not accepted:
+        return [], errors
+
+    parents = {}
+    for parent_id, student_id in ParentStudent.objects.filter(
+        student__in=[owner for owner, _ in accepted if owner.role == 'student']
+    ).values_list('parent_id', 'student_id'):
+        parents.setdefault(student_id, []).append(parent_id)
+
+    by_school = {}
+    for owner, entry in accepted:
+        by_school.setdefault(owner.school, []).append((owner, entry))
+
+    cards = []
+    notifications = []
+    with db_transaction.atomic():
+        for school, school_entries in by_school.items():
+            control_numbers = allocate_control_numbers(school, len(school_entries))
+            for (owner, entry), control_number in zip(school_entries, control_numbers):
+                card = RFIDCard(
+                    student_or_staff=owner,
+                    card_number=entry['card_number'],
+                    control_number=control_number,
+                    balance=entry['balance'],
+                    issued_date=entry['issued_date'],
+                    is_active=False,
+                )
+                cards.append(card)
+                notifications.extend(card_created_notifications(card, parents.get(owner.id, ())))
+
+        RFIDCard.objects.bulk_create(cards, batch_size=IMPORT_BATCH_SIZE)
+        BalanceLedger.objects.bulk_create(
+            [BalanceLedger(card=card, entry_type='opening', amount=card.balance) for card in cards],
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+        Notification.objects.bulk_create(notifications, batch_size=IMPORT_BATCH_SIZE)
+
+    # bulk_create sends no post_save, invalidate cached responses by hand
+    bump_model_versions(RFIDCard, BalanceLedger, Notification)
+    errors.sort(key=lambda error: error['index'])
+    return cards, errors
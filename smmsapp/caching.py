@@ -0,0 +1,116 @@
+import functools
+import hashlib
+import json
+import logging
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+# ---- MODEL VERSIONS -----
+# Every model has a version number in the cache, bumped whenever one of its rows is
+# saved or deleted (see signals.py). Cached responses embed the versions of the models
+# they were built from, so a write makes them unreachable without deleting keys.
+
+def model_version_key(model):
+    return f"model-version:{model._meta.label_lower}"
+
+
+def bump_model_versions(*models):
+    """Invalidate cached responses built from these models. Call after bulk update()/bulk_create()."""
+    for model in models:
+        key = model_version_key(model)
+        try:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+        except Exception as e:
+            logger.warning(f"Could not bump cache version of {model._meta.label}: {e}")
+
+
+def get_model_versions(models):
+    keys = [model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    return [str(versions.get(key, 0)) for key in keys]
+
+
+# ---- AUTHENTICATED USER CACHE -----
+# CachedJWTAuthentication keeps request users under a per-user version, bumped when the
+# user is saved or deleted (see signals.py) and on logout.
+
+def user_version_key(user_id):
+    return f"auth-user-version:{user_id}"
+
+
+def cached_user_key(user_id):
+    version = cache.get(user_version_key(user_id), 0)
+    return f"auth-user:{user_id}:{version}"
+
+
+def invalidate_cached_user(user_id):
+    key = user_version_key(user_id)
+    try:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached user {user_id}: {e}")
+
+
+# ---- PER VIEW RESPONSE CACHE -----
+def response_cache_key(view, request):
+    """Build the key from the view, its scope, the model versions and the request parameters."""
+    scope = getattr(view, 'cache_scope', 'global')
+    if scope == 'user':
+        scope_key = f"user:{request.user.pk}"
+    elif scope == 'role':
+        scope_key = f"role:{getattr(request.user, 'role', 'anonymous')}"
+    else:
+        scope_key = 'global'
+
+    params = {
+        'query': request.query_params.dict(),
+        'data': request.data.dict() if hasattr(request.data, 'dict') else request.data,
+    }
+    if hasattr(view, 'cache_key_params'):
+        # Values the handler resolves itself (e.g. a default date) that the request does not carry
+        params['view'] = view.cache_key_params(request)
+    params_hash = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    versions = '.'.join(get_model_versions(getattr(view, 'cache_models', ())))
+
+    return f"view:{view.__class__.__name__}:{request.method}:{scope_key}:{versions}:{params_hash}"
+
+
+def cached_response(handler):
+    """
+    Cache successful responses of a view handler. The view declares:
+
+    - cache_timeout: seconds to keep a response
+    - cache_scope: 'global', 'role' (shared by a role) or 'user' (per user)
+    - cache_models: models whose writes invalidate the cached responses
+    - cache_key_params(request) (optional): extra values the response depends on
+
+    The cache is skipped, not fatal, when Redis is unavailable.
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        try:
+            key = response_cache_key(view, request)
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache unavailable for {view.__class__.__name__}: {e}")
+            return handler(view, request, *args, **kwargs)
+
+        if cached is not None:
+            data, status_code = cached
+            return Response(data, status=status_code)
+
+        response = handler(view, request, *args, **kwargs)
+
+        if response.status_code == 200:
+            try:
+                cache.set(key, (response.data, response.status_code), getattr(view, 'cache_timeout', 60))
+            except Exception as e:
+                logger.warning(f"Could not cache response of {view.__class__.__name__}: {e}")
+        return response
+
+    return wrapper
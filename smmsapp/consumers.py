@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from .authentication import CachedJWTAuthentication
+from .models import ScanSession
+from .scanning import process_scan, run_blocking, ScanError
+from .serializers.SessionSerializers import ScannedDataSerializer
+
+# Close codes sent to the terminal
+CLOSE_UNAUTHENTICATED = 4001
+CLOSE_FORBIDDEN = 4003
+CLOSE_SESSION_NOT_FOUND = 4004
+
+
+def authenticate_token(raw_token):
+    """Validate an access token and return (user, expiry timestamp)."""
+    authentication = CachedJWTAuthentication()
+    validated_token = authentication.get_validated_token(raw_token)
+    return authentication.get_user(validated_token), validated_token['exp']
+
+
+def serialize_scan(scanned_data):
+    return ScannedDataSerializer(scanned_data).data
+
+
+# ---- WEBSOCKET SCAN CHANNEL -----
+class ScanConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One connection per operator terminal and scan session. The terminal authenticates
+    once with its first frame and then streams scans over the same connection:
+
+        -> {"type": "auth", "token": "<access token>", "session_id": "<id>"}
+        <- {"type": "ready", "session_id": "<id>"}
+        -> {"type": "scan", "ref": 1, "card_number": "...", "item_id": "..."}
+        <- {"type": "scan_result", "ref": 1, "code": 201, "data": {...}}
+        <- {"type": "scan_result", "ref": 1, "code": 119, "message": "..."}
+
+    Scans follow the same rules as ScanRFIDCardView (process_scan). Sending a new "auth"
+    frame replaces an expiring token without reconnecting.
+    """
+
+    async def connect(self):
+        self.user = None
+        self.session_id = None
+        self.token_expires_at = 0
+        await self.accept()
+        self.auth_timeout = asyncio.ensure_future(self.close_if_unauthenticated())
+
+    async def disconnect(self, code):
+        self.auth_timeout.cancel()
+
+    async def close_if_unauthenticated(self):
+        await asyncio.sleep(settings.SCAN_SOCKET_AUTH_TIMEOUT)
+        if self.user is None:
+            await self.send_error(401, 'Authentication timed out', close_code=CLOSE_UNAUTHENTICATED)
+
+    async def receive_json(self, content, **kwargs):
+        frame_type = content.get('type') if isinstance(content, dict) else None
+
+        if frame_type == 'auth':
+            await self.authenticate(content)
+        elif frame_type == 'ping':
+            await self.send_json({'type': 'pong'})
+        elif self.user is None:
+            await self.send_error(401, 'Authenticate first', close_code=CLOSE_UNAUTHENTICATED)
+        elif time.time() >= self.token_expires_at:
+            await self.send_error(401, 'Token expired, send a new auth frame')
+        elif frame_type == 'scan':
+            await self.scan(content)
+        else:
+            await self.send_error(400, f'Unknown frame type: {frame_type}')
+
+    async def authenticate(self, content):
+        try:
+            user, expires_at = await run_blocking(authenticate_token, content.get('token') or '')
+        except (InvalidToken, AuthenticationFailed):
+            return await self.send_error(401, 'Invalid or expired token', close_code=CLOSE_UNAUTHENTICATED)
+
+        if user.role != 'operator':
+            return await self.send_error(403, 'Only operators can scan cards', close_code=CLOSE_FORBIDDEN)
+
+        # A token refresh keeps the session, a first auth binds the connection to one
+        session_id = content.get('session_id') or self.session_id
+        try:
+            await ScanSession.objects.aget(id=session_id, operator=user, status='active')
+        except (ScanSession.DoesNotExist, ValidationError):
+            return await self.send_error(114, 'Active session not found', close_code=CLOSE_SESSION_NOT_FOUND)
+
+        self.user = user
+        self.session_id = str(session_id)
+        self.token_expires_at = expires_at
+        await self.send_json({'type': 'ready', 'session_id': self.session_id})
+
+    async def scan(self, content):
+        ref = content.get('ref')
+        try:
+            scanned_data = await run_blocking(process_scan, self.session_id, content.get('card_number'), content.get('item_id'))
+        except ScanError as e:
+            return await self.send_json({'type': 'scan_result', 'ref': ref, 'code': e.code, 'message': e.message})
+
+        data = await run_blocking(serialize_scan, scanned_data)
+        await self.send_json({'type': 'scan_result', 'ref': ref, 'code': 201, 'data': data})
+
+    async def send_error(self, code, message, close_code=None):
+        await self.send_json({'type': 'error', 'code': code, 'message': message})
+        if close_code is not None:
+            await self.close(code=close_code)
+
+    @classmethod
+    async def decode_json(cls, text_data):
+        # A malformed frame is answered like an unknown one instead of dropping the socket
+        try:
+            return json.loads(text_data)
+        except ValueError:
+            return None
+
+    @classmethod
+    async def encode_json(cls, content):
+        # Serializer output holds UUIDs and decimals
+        return json.dumps(content, cls=DjangoJSONEncoder)
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+REPLICA_DB = 'replica'
+
+# Where reads go in the current request/task: None (primary), 'replica' or 'pinned'
+_read_target = ContextVar('smms_read_target', default=None)
+
+
+@contextmanager
+def use_replica():
+    """
+    Send the reads made inside this block to the read replica. Works as a context
+    manager or, with parentheses, as a decorator: @use_replica() /
+    @method_decorator(use_replica(), name='post'). Without a configured replica
+    the reads stay on the primary.
+    """
+    token = _read_target.set(REPLICA_DB)
+    try:
+        yield
+    finally:
+        _read_target.reset(token)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+# ---- PRIMARY / REPLICA ROUTER -----
+class ReplicaRouter:
+    """
+    Reads go to the primary unless the view or task opted in with use_replica(), so the
+    scan and session flows always read their own writes. Inside an opted-in block a
+    write, or an open transaction on the primary, pins the remaining reads to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_target.get() != REPLICA_DB or not replica_configured():
+            return None
+        if connections['default'].in_atomic_block:
+            return None
+        return REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        if _read_target.get() == REPLICA_DB:
+            _read_target.set('pinned')
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        return db != REPLICA_DB
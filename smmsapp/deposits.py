@@ -0,0 +1,324 @@
+import csv
+import hashlib
+import hmac
+import io
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction as db_transaction
+from django.db.models import Case, When, Value, F, DecimalField
+from django.utils import timezone
+from .caching import bump_model_versions
+from .models import BankDeposit, RFIDCard, ParentStudent, Notification, BalanceLedger
+from .scanning import unblock_cards
+
+logger = logging.getLogger(__name__)
+
+DEPOSIT_CHUNK_SIZE = 2000
+
+# Fixed-width statement lines: (field, start, end), amount right aligned with 2 decimals
+FIXED_WIDTH_FIELDS = (
+    ('transaction_date', 0, 8),     # YYYYMMDD
+    ('reference', 8, 28),
+    ('control_number', 28, 48),
+    ('amount', 48, 63),
+)
+STATEMENT_FORMATS = ('csv', 'fixed')
+
+# Bounds of the BankDeposit columns, larger values would fail the insert
+_amount_field = BankDeposit._meta.get_field('amount')
+MAX_DEPOSIT_AMOUNT = Decimal(10) ** (_amount_field.max_digits - _amount_field.decimal_places) - Decimal('0.01')
+REFERENCE_MAX_LENGTH = BankDeposit._meta.get_field('reference').max_length
+
+
+# ---- READ STATEMENT -----
+def read_statement_rows(file, file_format):
+    """
+    Yield (line number, row dict) from a CSV (with header: control_number, amount,
+    reference, transaction_date) or fixed-width statement, one line at a time.
+    """
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'fixed':
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                yield line_number, {field: line[start:end] for field, start, end in FIXED_WIDTH_FIELDS}
+    else:
+        raise ValueError(f"Unsupported format: {file_format}. Use 'csv' or 'fixed'.")
+
+
+def parse_amount(value):
+    """Positive amount rounded to cents that fits the amount column, else None."""
+    try:
+        amount = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or amount <= 0 or amount > MAX_DEPOSIT_AMOUNT:
+        return None
+    amount = amount.quantize(Decimal('0.01'))
+    # Rounding may still carry past the bound (e.g. 99999999.999)
+    return amount if 0 < amount <= MAX_DEPOSIT_AMOUNT else None
+
+
+def parse_transaction_date(value):
+    value = (value or '').strip()
+    if not value:
+        return timezone.now()
+    try:
+        date = datetime.strptime(value, '%Y%m%d') if value.isdigit() else datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return timezone.make_aware(date) if timezone.is_naive(date) else date
+
+
+def normalize_control_number(value):
+    return str(value or '').strip().replace(' ', '').replace('-', '')
+
+
+# ---- POST DEPOSITS -----
+def credit_deposits(deposits):
+    """
+    Insert unsaved BankDeposit rows with their ledger entries and credit their cards, one
+    UPDATE for all cards: balance = balance + CASE control_number WHEN ... THEN total END.
+    Must run inside a transaction so deposits, ledger and balances are written together.
+    """
+    totals = {}
+    for deposit in deposits:
+        totals[deposit.control_number_id] = totals.get(deposit.control_number_id, 0) + deposit.amount
+
+    BankDeposit.objects.bulk_create(deposits, batch_size=DEPOSIT_CHUNK_SIZE)
+    card_ids = dict(RFIDCard.objects.filter(control_number__in=totals).values_list('control_number', 'id'))
+    BalanceLedger.objects.bulk_create([
+        BalanceLedger(card_id=card_ids[deposit.control_number_id], entry_type='deposit', amount=deposit.amount, deposit=deposit)
+        for deposit in deposits
+    ], batch_size=DEPOSIT_CHUNK_SIZE)
+    RFIDCard.objects.filter(control_number__in=totals).update(
+        balance=F('balance') + Case(
+            *[When(control_number=control_number, then=Value(total)) for control_number, total in totals.items()],
+            default=Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+    # Cards blocked for insufficient meals are usable again once back above zero
+    unblock_cards(RFIDCard.objects.filter(control_number__in=totals))
+    return deposits
+
+
+class StatementImporter:
+    """
+    Stream a bank statement, match rows to cards through a map of control numbers loaded
+    up front, and post them chunk by chunk: each chunk is one transaction with a bulk
+    insert of deposits and a single balance UPDATE.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.control_numbers = {
+            normalize_control_number(number): number
+            for number in RFIDCard.objects.values_list('control_number', flat=True)
+        }
+        self.seen_references = set()
+        self.errors = []
+        self.posted = 0
+        self.duplicates = 0
+        self.total = Decimal('0.00')
+
+    def error(self, row_number, code, message):
+        self.errors.append({'row': row_number, 'code': code, 'message': message})
+
+    def build(self, row_number, row):
+        reference = (row.get('reference') or '').strip()
+        if not reference:
+            return self.error(row_number, 400, "Reference is required.")
+        if len(reference) > REFERENCE_MAX_LENGTH:
+            return self.error(row_number, 400, f"Reference is longer than {REFERENCE_MAX_LENGTH} characters.")
+        if reference in self.seen_references:
+            self.duplicates += 1
+            return None
+
+        control_number = self.control_numbers.get(normalize_control_number(row.get('control_number')))
+        if control_number is None:
+            return self.error(row_number, 404, f"Unknown control number: {(row.get('control_number') or '').strip()}")
+        amount = parse_amount(row.get('amount'))
+        if amount is None:
+            return self.error(row_number, 400, f"Invalid amount: {(row.get('amount') or '').strip()}")
+        transaction_date = parse_transaction_date(row.get('transaction_date'))
+        if transaction_date is None:
+            return self.error(row_number, 400, f"Invalid transaction date: {row.get('transaction_date')}")
+
+        self.seen_references.add(reference)
+        return BankDeposit(
+            control_number_id=control_number,
+            amount=amount,
+            transaction_date=transaction_date,
+            source=self.source,
+            reference=reference,
+            status='processed',
+        )
+
+    def post_chunk(self, chunk):
+        references = [deposit.reference for _, deposit in chunk]
+        # Posted by an earlier import of the same statement
+        existing = set(BankDeposit.objects.filter(source=self.source, reference__in=references)
+                                          .values_list('reference', flat=True))
+        deposits = [deposit for _, deposit in chunk if deposit.reference not in existing]
+        self.duplicates += len(chunk) - len(deposits)
+        if not deposits:
+            return
+
+        processed_at = timezone.now()
+        for deposit in deposits:
+            deposit.processed_at = processed_at
+        try:
+            with db_transaction.atomic():
+                credit_deposits(deposits)
+        except IntegrityError:
+            # Another import posted some of these references meanwhile, nothing in the chunk was kept
+            for row_number, deposit in chunk:
+                if deposit.reference not in existing:
+                    self.error(row_number, 409, "Deposit was posted concurrently, import the statement again.")
+            return
+        except DatabaseError as e:
+            # e.g. a balance overflowing its column, the chunk was rolled back and earlier chunks stay posted
+            logger.warning(f"Could not post {len(deposits)} statement deposits: {e}")
+            for row_number, deposit in chunk:
+                if deposit.reference not in existing:
+                    self.error(row_number, 500, f"Deposit could not be posted ({e.__class__.__name__}), nothing in rows {chunk[0][0]}-{chunk[-1][0]} was posted.")
+            return
+
+        self.posted += len(deposits)
+        self.total += sum(deposit.amount for deposit in deposits)
+
+    def run(self, rows):
+        chunk = []
+        count = 0
+        for row_number, row in rows:
+            count += 1
+            deposit = self.build(row_number, row)
+            if deposit is not None:
+                chunk.append((row_number, deposit))
+            if len(chunk) >= DEPOSIT_CHUNK_SIZE:
+                self.post_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.post_chunk(chunk)
+
+        if self.posted:
+            # update()/bulk_create() send no post_save, invalidate cached responses by hand
+            bump_model_versions(BankDeposit, RFIDCard)
+
+        self.errors.sort(key=lambda error: error['row'])
+        return {
+            'rows': count,
+            'posted': self.posted,
+            'amount': str(self.total),
+            'duplicates': self.duplicates,
+            'errors': self.errors,
+        }
+
+
+def import_statement(file, file_format, source='statement'):
+    return StatementImporter(source).run(read_statement_rows(file, file_format))
+
+
+# ---- GATEWAY CALLBACKS -----
+class DepositError(Exception):
+    def __init__(self, code, message, http_status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.http_status = http_status
+
+
+def gateway_signature(body, secret=None):
+    """Hex HMAC-SHA256 of the raw callback body, sent by the gateway in X-Signature."""
+    secret = settings.PAYMENT_WEBHOOK_SECRET if secret is None else secret
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_gateway_signature(body, signature):
+    if not settings.PAYMENT_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(gateway_signature(body), signature.strip())
+
+
+def record_gateway_deposit(payload, source=None):
+    """
+    Post one gateway callback: {"reference", "control_number", "amount", "transaction_date"}.
+    The deposit and the balance credit commit together; a reference already posted for the
+    source is not credited again. Returns (deposit, created).
+    """
+    source = source or settings.PAYMENT_GATEWAY_SOURCE
+    reference = str(payload.get('reference') or '').strip()
+    if not reference:
+        raise DepositError(400, "Reference is required.")
+    if len(reference) > REFERENCE_MAX_LENGTH:
+        raise DepositError(400, f"Reference is longer than {REFERENCE_MAX_LENGTH} characters.")
+
+    existing = BankDeposit.objects.filter(source=source, reference=reference).first()
+    if existing is not None:
+        return existing, False
+
+    amount = parse_amount(payload.get('amount'))
+    if amount is None:
+        raise DepositError(400, f"Invalid amount: {payload.get('amount')}")
+    transaction_date = parse_transaction_date(str(payload.get('transaction_date') or ''))
+    if transaction_date is None:
+        raise DepositError(400, f"Invalid transaction date: {payload.get('transaction_date')}")
+    control_number = RFIDCard.objects.filter(
+        control_number=normalize_control_number(payload.get('control_number'))
+    ).values_list('control_number', flat=True).first()
+    if control_number is None:
+        raise DepositError(404, "Card with this control number not found", http_status=404)
+
+    deposit = BankDeposit(
+        control_number_id=control_number,
+        amount=amount,
+        transaction_date=transaction_date,
+        source=source,
+        reference=reference,
+        status='processed',
+        processed_at=timezone.now(),
+    )
+    try:
+        with db_transaction.atomic():
+            credit_deposits([deposit])
+            db_transaction.on_commit(lambda: deposit_posted(deposit.id))
+    except IntegrityError:
+        # A retry of the same callback won the race, it credited the card
+        return BankDeposit.objects.get(source=source, reference=reference), False
+
+    return deposit, True
+
+
+def deposit_posted(deposit_id):
+    from .tasks import notify_deposit
+
+    bump_model_versions(BankDeposit, RFIDCard)
+    try:
+        notify_deposit.apply_async((str(deposit_id),), retry=False)
+    except Exception as e:
+        # The deposit is credited, a broker outage must not fail the callback
+        logger.warning(f"Could not queue notification for deposit {deposit_id}: {e}")
+
+
+def deposit_notifications(deposit, card):
+    """Unsaved notifications telling the card owner's parents (or the staff member) about a top-up."""
+    owner = card.student_or_staff
+    message = (f"Tsh. {deposit.amount} was deposited to {owner.first_name} {owner.last_name}'s meal card "
+               f"(Control Number: {card.control_number}). \nNew Balance: Tsh. {card.balance}.")
+    if owner.role == 'student':
+        recipients = ParentStudent.objects.filter(student=owner).values_list('parent_id', flat=True)
+    else:
+        recipients = [owner.id]
+    return [
+        Notification(recipient_id=recipient_id, title="Meal Card Top-up", message=message, status='pending', type='reminder')
+        for recipient_id in recipients
+    ]
@@ -0,0 +1,169 @@
+import os
+import shutil
+from datetime import timedelta
+from itertools import groupby, islice
+from operator import itemgetter
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .db_routers import use_replica
+from .ledger import day_start
+from .models import Transaction, ScannedData, BankDeposit
+
+
+def optional_str(value):
+    return None if value is None else str(value)
+
+
+# Column kinds: arrow type and the conversion applied to the database value
+COLUMN_KINDS = {
+    'uuid': (pa.string(), optional_str),
+    'text': (pa.string(), None),
+    'timestamp': (pa.timestamp('us', tz='UTC'), None),
+    'decimal': (pa.decimal128(10, 2), None),
+    'count': (pa.int64(), None),
+}
+
+
+# ---- DATASETS -----
+# Each dataset reads one day as rows whose first value is the school, ordered by school, so
+# the rows of a school arrive together and are written to its own file.
+
+def transaction_rows(start, end):
+    return (
+        Transaction.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+                           .order_by('student_or_staff__school_id', 'transaction_date')
+                           .values_list('student_or_staff__school_id', 'id', 'rfid_card_id', 'student_or_staff_id', 'item_id',
+                                        'item__name', 'amount', 'transaction_status', 'session_id', 'transaction_date')
+    )
+
+
+def scanned_data_rows(start, end):
+    return (
+        ScannedData.objects.filter(scanned_at__gte=start, scanned_at__lt=end)
+                           .order_by('student_or_staff__school_id', 'scanned_at')
+                           .values_list('student_or_staff__school_id', 'id', 'session_id', 'rfid_card_id',
+                                        'student_or_staff_id', 'item_id', 'scanned_at')
+    )
+
+
+def deposit_rows(start, end):
+    return (
+        BankDeposit.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+                           .order_by('control_number__student_or_staff__school_id', 'transaction_date')
+                           .values_list('control_number__student_or_staff__school_id', 'id', 'control_number_id', 'amount',
+                                        'status', 'source', 'reference', 'transaction_date', 'processed_at')
+    )
+
+
+def daily_sales_rows(start, end):
+    """Rollup of the day's transactions per school, item and status."""
+    return (
+        Transaction.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+                           .values('student_or_staff__school_id', 'item_id', 'item__name', 'transaction_status')
+                           .annotate(transactions=Count('id'), amount=Sum('amount'))
+                           .order_by('student_or_staff__school_id', 'item__name', 'transaction_status')
+                           .values_list('student_or_staff__school_id', 'item_id', 'item__name', 'transaction_status',
+                                        'transactions', 'amount')
+    )
+
+
+EXPORT_DATASETS = {
+    'transactions': (transaction_rows, (
+        ('id', 'uuid'), ('card_id', 'uuid'), ('student_or_staff_id', 'uuid'), ('item_id', 'uuid'), ('item', 'text'),
+        ('amount', 'decimal'), ('status', 'text'), ('session_id', 'uuid'), ('transaction_date', 'timestamp'),
+    )),
+    'scanned_data': (scanned_data_rows, (
+        ('id', 'uuid'), ('session_id', 'uuid'), ('card_id', 'uuid'), ('student_or_staff_id', 'uuid'),
+        ('item_id', 'uuid'), ('scanned_at', 'timestamp'),
+    )),
+    'deposits': (deposit_rows, (
+        ('id', 'uuid'), ('control_number', 'text'), ('amount', 'decimal'), ('status', 'text'), ('source', 'text'),
+        ('reference', 'text'), ('transaction_date', 'timestamp'), ('processed_at', 'timestamp'),
+    )),
+    'daily_sales': (daily_sales_rows, (
+        ('item_id', 'uuid'), ('item', 'text'), ('status', 'text'), ('transactions', 'count'), ('amount', 'decimal'),
+    )),
+}
+
+
+def dataset_schema(columns):
+    return pa.schema([(name, COLUMN_KINDS[kind][0]) for name, kind in columns])
+
+
+def record_batch(rows, columns, schema):
+    """Arrow batch of the rows (school first, left out: it is in the path)."""
+    arrays = []
+    for index, (name, kind) in enumerate(columns, start=1):
+        arrow_type, convert = COLUMN_KINDS[kind]
+        values = [convert(row[index]) for row in rows] if convert else [row[index] for row in rows]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+# ---- WRITE ONE DAY -----
+def school_partition(school_id):
+    # Hive's name for a null partition value (users without a school)
+    return f"school={school_id or '__HIVE_DEFAULT_PARTITION__'}"
+
+
+def export_dataset_day(dataset, day, root=None, chunk_size=None):
+    """
+    Write one day of a dataset as <root>/<dataset>/date=YYYY-MM-DD/school=<id>/part-0.parquet.
+    Rows stream from the database chunk_size at a time, each chunk is one row group. The
+    day is written to a staging directory and swapped in, so re-running a day replaces it.
+    Returns (rows, files).
+    """
+    root = root or settings.EXPORT_ROOT
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    read_rows, columns = EXPORT_DATASETS[dataset]
+    schema = dataset_schema(columns)
+
+    target = os.path.join(root, dataset, f"date={day:%Y-%m-%d}")
+    staging = os.path.join(root, dataset, f".date={day:%Y-%m-%d}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+
+    exported = files = 0
+    writer = None
+    current = object()
+    rows = read_rows(day_start(day), day_start(day + timedelta(days=1))).iterator(chunk_size=chunk_size)
+    try:
+        while chunk := list(islice(rows, chunk_size)):
+            for school_id, school_rows in groupby(chunk, key=itemgetter(0)):
+                if school_id != current:
+                    if writer is not None:
+                        writer.close()
+                    directory = os.path.join(staging, school_partition(school_id))
+                    os.makedirs(directory, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(directory, 'part-0.parquet'), schema, compression=settings.EXPORT_COMPRESSION)
+                    current = school_id
+                    files += 1
+                school_rows = list(school_rows)
+                writer.write_batch(record_batch(school_rows, columns, schema))
+                exported += len(school_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    shutil.rmtree(target, ignore_errors=True)
+    if files:
+        os.replace(staging, target)
+    return exported, files
+
+
+def export_analytics(days=None, datasets=None, root=None, chunk_size=None):
+    """
+    Export each of `days` (default yesterday) for every dataset, reading from the replica
+    when one is configured. Returns {day: {dataset: {'rows': n, 'files': n}}}.
+    """
+    days = days or [timezone.localdate() - timedelta(days=1)]
+    report = {}
+    with use_replica():
+        for day in days:
+            report[day.isoformat()] = {}
+            for dataset in datasets or EXPORT_DATASETS:
+                exported, files = export_dataset_day(dataset, day, root, chunk_size)
+                report[day.isoformat()][dataset] = {'rows': exported, 'files': files}
+    return report
@@ -0,0 +1,227 @@
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .caching import bump_model_versions
+from .ledger import day_start
+from .models import RFIDCard, Transaction, ParentStudent, Notification, ScannedData, DemandForecast
+
+REMINDER_BATCH_SIZE = 2000
+FORECAST_BATCH_SIZE = 2000
+
+
+# ---- SPEND MATRIX -----
+# Spend is loaded as a cards x days matrix (one grouped query, one row per card and day)
+# and every step after that works on whole arrays, so the cost barely depends on how
+# many cards there are.
+
+def daily_spend(card_index, start, days):
+    """Matrix of what each card spent (purchases and penalties) on each of `days` days from `start`."""
+    spend = np.zeros((len(card_index), days))
+    rows = (
+        Transaction.objects.filter(transaction_date__gte=day_start(start), transaction_date__lt=day_start(start + timedelta(days=days)),
+                                   transaction_status__in=['successful', 'penalt'])
+                           .annotate(day=TruncDate('transaction_date'))
+                           .values('rfid_card', 'day').annotate(total=Sum('amount'))
+                           .values_list('rfid_card', 'day', 'total').order_by()
+    )
+    cards, offsets, totals = [], [], []
+    for card_id, day, total in rows.iterator():
+        if card_id in card_index:
+            cards.append(card_index[card_id])
+            offsets.append((day - start).days)
+            totals.append(total)
+    np.add.at(spend, (np.array(cards, dtype=np.intp), np.array(offsets, dtype=np.intp)), np.array(totals, dtype=float))
+    return spend
+
+
+def weekday_profile(spend, start, first_day):
+    """
+    Average spend per card and weekday (cards x 7). Canteen spend follows the school week,
+    so each weekday is averaged separately; days before a card was issued are not counted.
+    """
+    days = spend.shape[1]
+    weekdays = (start.weekday() + np.arange(days)) % 7
+    one_hot = np.eye(7)[weekdays]  # days x 7
+    observed = np.arange(days)[None, :] >= first_day[:, None]  # cards x days
+    totals = (spend * observed) @ one_hot
+    counts = observed.astype(float) @ one_hot
+    return np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+
+
+def expected_spend(profile, today, horizon):
+    """Expected spend of each card on each of the next `horizon` days (cards x horizon)."""
+    weekdays = (today.weekday() + np.arange(1, horizon + 1)) % 7
+    return profile[:, weekdays]
+
+
+def days_until_empty(balances, ahead):
+    """
+    Days from today until each card's projected balance goes negative (1 = tomorrow),
+    0 where it stays positive for the whole horizon.
+    """
+    projected = balances[:, None] - np.cumsum(ahead, axis=1)
+    negative = projected < 0
+    return np.where(negative.any(axis=1), negative.argmax(axis=1) + 1, 0)
+
+
+# ---- REMINDERS -----
+def reminder_title(control_number):
+    return f"Low Balance ({control_number})"
+
+
+def low_balance_notifications(cards, parents, skip):
+    """Unsaved reminders for (card row, days left) pairs, minus the (recipient, title) pairs in `skip`."""
+    notifications = []
+    for (_, balance, _, control_number, owner_id, role, first_name, last_name), days_left in cards:
+        when = "tomorrow" if days_left == 1 else f"within {days_left} days"
+        if role == 'student':
+            recipients = parents.get(owner_id, [])
+            message = (f"Your child {first_name} {last_name}'s meal card (Control Number: {control_number}) has a balance of {balance} "
+                       f"and at the usual spending may run out {when}. Please recharge to avoid penalts.")
+        else:
+            recipients = [owner_id]
+            message = (f"Your meal card (Control Number: {control_number}) has a balance of {balance} "
+                       f"and at the usual spending may run out {when}. Please recharge to avoid penalts.")
+        title = reminder_title(control_number)
+        notifications.extend(
+            Notification(recipient_id=recipient_id, title=title, message=message, status='pending', type='reminder')
+            for recipient_id in recipients if (recipient_id, title) not in skip
+        )
+    return notifications
+
+
+def send_low_balance_reminders(horizon=None, lookback_weeks=None, dry_run=False):
+    """
+    Project every active card's balance over the next `horizon` days from its weekday spend
+    of the last `lookback_weeks` weeks, and remind the parents (or staff member) of cards
+    projected to go negative. A card is reminded at most once per LOW_BALANCE_REMINDER_DAYS.
+    Returns {'cards', 'at_risk', 'notifications'}.
+    """
+    horizon = horizon or settings.LOW_BALANCE_HORIZON_DAYS
+    lookback_days = (lookback_weeks or settings.LOW_BALANCE_LOOKBACK_WEEKS) * 7
+    today = timezone.localdate()
+    start = today - timedelta(days=lookback_days)
+
+    cards = list(
+        RFIDCard.objects.filter(is_active=True, balance__gte=0)
+                        .values_list('id', 'balance', 'created_at', 'control_number', 'student_or_staff_id',
+                                     'student_or_staff__role', 'student_or_staff__first_name', 'student_or_staff__last_name')
+                        .order_by()
+    )
+    if not cards:
+        return {'cards': 0, 'at_risk': 0, 'notifications': 0}
+
+    card_index = {card[0]: index for index, card in enumerate(cards)}
+    balances = np.array([card[1] for card in cards], dtype=float)
+    first_day = np.array([(timezone.localdate(card[2]) - start).days for card in cards])
+
+    profile = weekday_profile(daily_spend(card_index, start, lookback_days), start, first_day)
+    days_left = days_until_empty(balances, expected_spend(profile, today, horizon))
+    at_risk = np.flatnonzero(days_left)
+
+    result = {'cards': len(cards), 'at_risk': len(at_risk), 'notifications': 0}
+    if dry_run or not len(at_risk):
+        return result
+
+    notified = 0
+    since = timezone.now() - timedelta(days=settings.LOW_BALANCE_REMINDER_DAYS)
+    for batch_start in range(0, len(at_risk), REMINDER_BATCH_SIZE):
+        batch = [(cards[i], int(days_left[i])) for i in at_risk[batch_start:batch_start + REMINDER_BATCH_SIZE]]
+        parents = {}
+        student_ids = [card[4] for card, _ in batch if card[5] == 'student']
+        for student_id, parent_id in ParentStudent.objects.filter(student_id__in=student_ids).values_list('student_id', 'parent_id'):
+            parents.setdefault(student_id, []).append(parent_id)
+        skip = set(
+            Notification.objects.filter(type='reminder', created_at__gte=since, title__in=[reminder_title(card[3]) for card, _ in batch])
+                                .values_list('recipient_id', 'title')
+        )
+        with db_transaction.atomic():
+            notified += len(Notification.objects.bulk_create(low_balance_notifications(batch, parents, skip)))
+
+    if notified:
+        bump_model_versions(Notification)
+    result['notifications'] = notified
+    return result
+
+
+# ---- MEAL DEMAND -----
+# Scans of the last weeks are counted per (school, session type, item) and day, reshaped to
+# keys x weeks x weekdays, and averaged per weekday over the weeks, recent weeks weighing
+# more. Days a school did not hold the session (weekends, holidays) are left out rather
+# than counted as zero demand; an item not scanned on a day the session was held counts 0.
+
+def demand_history(start, days):
+    """(keys, counts): the (school, session type, item) keys and their scans per day (keys x days)."""
+    rows = list(
+        ScannedData.objects.filter(scanned_at__gte=day_start(start), scanned_at__lt=day_start(start + timedelta(days=days)), item__isnull=False)
+                           .annotate(day=TruncDate('scanned_at'))
+                           .values('student_or_staff__school_id', 'session__type', 'item_id', 'day')
+                           .annotate(count=Count('id'))
+                           .values_list('student_or_staff__school_id', 'session__type', 'item_id', 'day', 'count')
+                           .order_by()
+    )
+    key_index = {}
+    for school_id, session_type, item_id, _, _ in rows:
+        key_index.setdefault((school_id, session_type, item_id), len(key_index))
+
+    counts = np.zeros((len(key_index), days))
+    if rows:
+        index = np.array([key_index[row[:3]] for row in rows], dtype=np.intp)
+        offsets = np.array([(row[3] - start).days for row in rows], dtype=np.intp)
+        np.add.at(counts, (index, offsets), np.array([row[4] for row in rows], dtype=float))
+    return list(key_index), counts
+
+
+def weekday_demand(keys, counts, start, weeks):
+    """
+    Weighted moving average of each key's demand per weekday (Monday first) over the `weeks`
+    whole weeks of `counts` from `start`, and the number of weeks each average is built from.
+    """
+    groups = {}
+    group_of_key = np.array([groups.setdefault(key[:2], len(groups)) for key in keys], dtype=np.intp)
+
+    # Session held: at least one scan of any item in the school's session that day
+    group_counts = np.zeros((len(groups), counts.shape[1]))
+    np.add.at(group_counts, group_of_key, counts)
+    held = (group_counts > 0)[group_of_key].reshape(len(keys), weeks, 7)
+
+    weights = np.arange(1, weeks + 1, dtype=float)[None, :, None]  # the latest week weighs most
+    weighted = (counts.reshape(len(keys), weeks, 7) * held * weights).sum(axis=1)
+    total_weight = (held * weights).sum(axis=1)
+    average = np.divide(weighted, total_weight, out=np.zeros_like(weighted), where=total_weight > 0)
+    # Columns follow the days from start, roll them so column 0 is Monday
+    return np.roll(average, start.weekday(), axis=1), np.roll(held.sum(axis=1), start.weekday(), axis=1)
+
+
+def forecast_demand(date=None, weeks=None):
+    """
+    Store the expected scans per school, session type and item on `date` (default tomorrow)
+    from the same weekday of the last `weeks` weeks. Re-running a date replaces its forecast.
+    Returns the number of forecasts stored.
+    """
+    date = date or timezone.localdate() + timedelta(days=1)
+    weeks = weeks or settings.DEMAND_LOOKBACK_WEEKS
+    # Whole weeks up to the day before the forecast date
+    start = date - timedelta(weeks=weeks)
+
+    keys, counts = demand_history(start, weeks * 7)
+    forecasts = []
+    if keys:
+        average, observed = weekday_demand(keys, counts, start, weeks)
+        weekday = date.weekday()
+        for index in np.flatnonzero(average[:, weekday] > 0):
+            school_id, session_type, item_id = keys[index]
+            forecasts.append(DemandForecast(
+                date=date, school_id=school_id, session_type=session_type, item_id=item_id,
+                expected_count=round(float(average[index, weekday]), 1), weeks_observed=int(observed[index, weekday]),
+            ))
+
+    with db_transaction.atomic():
+        DemandForecast.objects.filter(date=date).delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=FORECAST_BATCH_SIZE)
+    bump_model_versions(DemandForecast)
+    return len(forecasts)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...archive import archive_old_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Move scanned data and sent/failed notifications older than their retention "
+        "(SCANNED_DATA_RETENTION_DAYS, NOTIFICATION_RETENTION_DAYS) to gzip JSON lines files "
+        "under ARCHIVE_ROOT, deleting them from the database in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE, help="Rows moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows past retention.")
+
+    def handle(self, *args, **options):
+        result = archive_old_data(dry_run=options['dry_run'], batch_size=options['batch_size'])
+        if not result:
+            self.stdout.write("Retention is disabled for every dataset.")
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        for dataset, count in result.items():
+            self.stdout.write(f"{verb} {count} {dataset} rows")
+        self.stdout.write(self.style.SUCCESS(f"Archive: {settings.ARCHIVE_ROOT}"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ...models import ScanSession, ScannedData, Transaction
+from ...utils import build_session_summary
+
+
+class Command(BaseCommand):
+    help = "Compute stored summaries for completed scan sessions that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Sessions handled per database transaction.")
+        parser.add_argument('--rebuild', action='store_true', help="Recompute summaries that already exist.")
+
+    def handle(self, *args, **options):
+        sessions = ScanSession.objects.filter(status='completed').order_by('start_at')
+        if not options['rebuild']:
+            sessions = sessions.filter(summary__isnull=True)
+
+        session_ids = list(sessions.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        self.stdout.write(f"Summarising {len(session_ids)} sessions...")
+
+        for start in range(0, len(session_ids), batch_size):
+            batch = ScanSession.objects.filter(id__in=session_ids[start:start + batch_size])
+            with transaction.atomic():
+                for session in batch:
+                    self.link_legacy_transactions(session)
+                    build_session_summary(session)
+            self.stdout.write(f"  {min(start + batch_size, len(session_ids))}/{len(session_ids)}")
+
+        self.stdout.write(self.style.SUCCESS("Session summaries are up to date."))
+
+    @staticmethod
+    def link_legacy_transactions(session):
+        """Transactions written before they carried a session are matched on card, item and session time."""
+        end_at = session.end_at or session.updated_at
+        scanned = ScannedData.objects.filter(session=session)
+        Transaction.objects.filter(
+            session__isnull=True,
+            rfid_card__in=scanned.values('rfid_card'),
+            item__in=scanned.values('item'),
+            transaction_date__range=(session.start_at, end_at),
+        ).update(session=session)
@@ -0,0 +1,47 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ...models import ScanSession, RFIDCard, CanteenItem
+
+
+class Command(BaseCommand):
+    help = "Time the scan-card lookups with a new database connection per request versus a reused one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Simulated requests per mode.")
+
+    def handle(self, *args, **options):
+        session = ScanSession.objects.filter(status='active').first() or ScanSession.objects.first()
+        card = RFIDCard.objects.filter(is_active=True).first()
+        item = CanteenItem.objects.first()
+        if not (session and card and item):
+            raise CommandError("Need at least one scan session, active RFID card and canteen item to benchmark.")
+
+        iterations = options['iterations']
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f"Database {settings_dict['HOST']}:{settings_dict['PORT']} "
+            f"(CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}), {iterations} iterations per mode"
+        )
+
+        for label, reconnect in (('new connection per request', True), ('persistent connection', False)):
+            timings = []
+            for _ in range(iterations):
+                if reconnect:
+                    connection.close()
+                started = time.perf_counter()
+                # Same reads the scan endpoint does before writing
+                ScanSession.objects.get(id=session.id)
+                RFIDCard.objects.select_related('student_or_staff').get(card_number=card.card_number)
+                CanteenItem.objects.get(id=item.id)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.report(label, timings)
+
+    def report(self, label, timings):
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"  {label:<28} mean {statistics.mean(timings):7.2f} ms   "
+            f"p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms"
+        )
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from ...exports import EXPORT_DATASETS, export_analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Export transactions, scanned data, deposits and daily sales rollups as zstd Parquet files, "
+        "partitioned as <dataset>/date=YYYY-MM-DD/school=<id>/. Re-exporting a day replaces it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Last day to export, YYYY-MM-DD (default yesterday).")
+        parser.add_argument('--days', type=int, default=1, help="Number of days to export, ending at --date.")
+        parser.add_argument('--dataset', action='append', choices=list(EXPORT_DATASETS), help="Dataset to export, repeatable (default all).")
+        parser.add_argument('--output', default=settings.EXPORT_ROOT, help="Directory to write to.")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE, help="Rows read from the database at a time.")
+
+    def handle(self, *args, **options):
+        try:
+            last = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD.")
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1.")
+
+        days = [last - timedelta(days=offset) for offset in range(options['days'] - 1, -1, -1)]
+        report = export_analytics(days, options['dataset'], options['output'], options['chunk_size'])
+        for day, datasets in report.items():
+            for dataset, result in datasets.items():
+                self.stdout.write(f"{day} {dataset}: {result['rows']} rows in {result['files']} files")
+        self.stdout.write(self.style.SUCCESS(f"Exported to {options['output']}"))
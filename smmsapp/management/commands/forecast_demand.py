@@ -0,0 +1,26 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the expected servings per school, session type and item for a date (default tomorrow) "
+        "from the same weekday of the last weeks of scans, replacing that date's forecast."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Date to forecast, YYYY-MM-DD (default tomorrow).")
+        parser.add_argument('--weeks', type=int, default=settings.DEMAND_LOOKBACK_WEEKS, help="Weeks of history to average.")
+
+    def handle(self, *args, **options):
+        try:
+            forecast_date = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD.")
+        if options['weeks'] < 1:
+            raise CommandError("--weeks must be at least 1.")
+
+        stored = forecast_demand(forecast_date, options['weeks'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} demand forecasts"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...deposits import import_statement, STATEMENT_FORMATS
+
+
+class Command(BaseCommand):
+    help = (
+        "Post the deposits of a bank statement to the cards they name. CSV files need a header "
+        "with control_number, amount, reference and optionally transaction_date. Fixed-width lines "
+        "hold date (YYYYMMDD, cols 1-8), reference (9-28), control number (29-48) and amount (49-63). "
+        "References already posted for the same source are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Statement file.")
+        parser.add_argument('--format', choices=STATEMENT_FORMATS, help="Defaults to csv for .csv files, fixed otherwise.")
+        parser.add_argument('--source', default='statement', help="Bank or statement name references are unique within.")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'fixed')
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_statement(file, file_format, source=options['source'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"  row {error['row']}: [{error['code']}] {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['posted']} deposits posted (Tsh. {result['amount']}) from {result['rows']} rows, "
+            f"{result['duplicates']} already posted, {len(result['errors'])} rejected."
+        ))
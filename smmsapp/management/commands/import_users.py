@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...bulk import import_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import students, staff and parents from a CSV (with header) or JSON lines file. "
+        "Columns: role, first_name, middle_name, last_name, username, email, mobile_number, "
+        "school (id, number or name), class_room, gender, parent_type, parents (';' separated "
+        "parent usernames, mobile numbers or ids)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, create nothing.")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_users(file, file_format, dry_run=options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"  row {error['row']}: [{error['code']}] {error['message']}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{result['valid']} rows valid, {len(result['errors'])} rejected (dry run).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result['created']} users imported, {len(result['errors'])} rows rejected."))
@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+import statistics
+import time
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+from ...models import CustomUser, ScanSession, RFIDCard, CanteenItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent scan-card requests at a running server and report throughput. "
+        "Run once against the sync endpoint and once against the async one to compare. "
+        "Scans are real: use a test database, balances and transactions are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Server to test.")
+        parser.add_argument('--path', default='/sessions/scan-card', help="/sessions/scan-card or /sessions/async/scan-card.")
+        parser.add_argument('--operator', required=True, help="Username of the operator scanning.")
+        parser.add_argument('--requests', type=int, default=500, help="Total scans to send.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Scans in flight at once (terminals).")
+
+    def handle(self, *args, **options):
+        try:
+            operator = CustomUser.objects.get(username=options['operator'], role='operator')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No operator named {options['operator']}")
+
+        # A card can buy an item once per session, so every request gets its own card/item pair
+        cards = list(RFIDCard.objects.filter(is_active=True).values_list('card_number', flat=True)[:options['requests']])
+        items = [str(item_id) for item_id in CanteenItem.objects.values_list('id', flat=True)]
+        pairs = list(itertools.islice(itertools.product(cards, items), options['requests']))
+        if not pairs:
+            raise CommandError("Need active RFID cards and canteen items to scan.")
+
+        ScanSession.objects.filter(operator=operator, status='active').update(status='completed')
+        session = ScanSession.objects.create(operator=operator, type='lunch')
+        token = str(RefreshToken.for_user(operator).access_token)
+
+        url = options['base_url'].rstrip('/') + options['path']
+        self.stdout.write(f"{len(pairs)} scans against {url} with concurrency {options['concurrency']}...")
+        try:
+            timings, statuses, elapsed = asyncio.run(
+                self.run(url, token, str(session.id), pairs, options['concurrency'])
+            )
+        finally:
+            ScanSession.objects.filter(id=session.id).update(status='completed')
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f"  throughput  {len(timings) / elapsed:8.1f} scans/s ({elapsed:.2f} s total)")
+        self.stdout.write(f"  latency     mean {statistics.mean(timings):7.1f} ms   p50 {statistics.median(timings):7.1f} ms   p95 {p95:7.1f} ms")
+        self.stdout.write(f"  statuses    {dict(sorted(statuses.items()))}")
+
+    async def run(self, url, token, session_id, pairs, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+        statuses = {}
+        headers = {'Authorization': f'Bearer {token}'}
+
+        async def scan(http, card_number, item_id):
+            async with semaphore:
+                started = time.perf_counter()
+                payload = {'session_id': session_id, 'card_number': card_number, 'item_id': item_id}
+                try:
+                    async with http.post(url, json=payload, headers=headers) as response:
+                        await response.read()
+                        code = response.status
+                except aiohttp.ClientError as e:
+                    code = type(e).__name__
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as http:
+            started = time.perf_counter()
+            await asyncio.gather(*(scan(http, card, item) for card, item in pairs))
+            elapsed = time.perf_counter() - started
+
+        return timings, statuses, elapsed
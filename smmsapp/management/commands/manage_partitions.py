@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ...partitions import manage_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the coming monthly partitions of transactions, scanned data and notifications, and "
+        "detach months older than the retention. Detached partitions stay as plain tables for archiving. "
+        "PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD, help="Months to create ahead of the current one.")
+        parser.add_argument('--retain', type=int, default=settings.PARTITION_RETENTION_MONTHS, help="Months to keep attached, 0 keeps all.")
+        parser.add_argument('--dry-run', action='store_true', help="Only show what would change.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Table partitioning needs PostgreSQL.")
+
+        report = manage_partitions(options['ahead'], options['retain'], dry_run=options['dry_run'])
+        if not report:
+            raise CommandError("No partitioned tables found, run the migrations first.")
+
+        prefix = "Would " if options['dry_run'] else ""
+        for table, changes in report.items():
+            for name in changes['created']:
+                self.stdout.write(f"{prefix}create {name}")
+            for name in changes['detached']:
+                self.stdout.write(f"{prefix}detach {name}")
+            if not changes['created'] and not changes['detached']:
+                self.stdout.write(f"{table}: up to date")
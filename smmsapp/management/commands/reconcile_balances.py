@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from ...reconciliation import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every card balance against its ledger and against the opening/adjustment entries "
+        "plus deposits minus scan transactions. Schools are reconciled in parallel processes, "
+        "cards that disagree are written to a CSV report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Processes to use, defaults to RECONCILE_WORKERS.")
+        parser.add_argument('--output', help="Report path, defaults to MEDIA_ROOT/reconciliation/.")
+
+    def handle(self, *args, **options):
+        result = reconcile_balances(workers=options['workers'], output=options['output'])
+        message = (f"{result['cards']} cards in {result['schools']} schools checked, "
+                   f"{result['discrepancies']} discrepancies (total {result['total_difference']}). Report: {result['report']}")
+        self.stdout.write(self.style.WARNING(message) if result['discrepancies'] else self.style.SUCCESS(message))
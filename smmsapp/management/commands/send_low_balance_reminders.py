@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...forecasting import send_low_balance_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Project every active card's balance from its recent weekday spend and queue reminders "
+        "to the parents (or staff members) of cards expected to go negative within the horizon."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=settings.LOW_BALANCE_HORIZON_DAYS, help="Days to project ahead.")
+        parser.add_argument('--lookback-weeks', type=int, default=settings.LOW_BALANCE_LOOKBACK_WEEKS, help="Weeks of spend history to average.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the cards at risk.")
+
+    def handle(self, *args, **options):
+        result = send_low_balance_reminders(options['horizon'], options['lookback_weeks'], dry_run=options['dry_run'])
+        self.stdout.write(f"{result['at_risk']} of {result['cards']} active cards projected to run out within {options['horizon']} days")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Queued {result['notifications']} reminders"))
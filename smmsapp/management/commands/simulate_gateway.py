@@ -0,0 +1,85 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...deposits import gateway_signature
+from ...models import RFIDCard
+
+
+class Command(BaseCommand):
+    help = (
+        "Stand-in for the payment gateway: fire signed deposit callbacks at a running server and "
+        "report throughput. A share of callbacks is resent, as gateways retry, to exercise "
+        "idempotency. Deposits are real: use a test database, balances are credited."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Server to call.")
+        parser.add_argument('--path', default='/payments/deposit-callback')
+        parser.add_argument('--requests', type=int, default=1000, help="Distinct deposits to send.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Callbacks in flight at once.")
+        parser.add_argument('--retries', type=float, default=0.1, help="Share of deposits sent a second time.")
+        parser.add_argument('--amount', default='1000.00', help="Amount of every deposit.")
+        parser.add_argument('--secret', help="Signing secret, defaults to PAYMENT_WEBHOOK_SECRET.")
+
+    def handle(self, *args, **options):
+        secret = options['secret'] or settings.PAYMENT_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError("Set PAYMENT_WEBHOOK_SECRET or pass --secret.")
+
+        control_numbers = list(RFIDCard.objects.values_list('control_number', flat=True)[:options['requests']])
+        if not control_numbers:
+            raise CommandError("Need RFID cards to deposit to.")
+
+        run_id = uuid.uuid4().hex[:8]
+        bodies = [
+            json.dumps({
+                'reference': f"SIM-{run_id}-{index}",
+                'control_number': control_numbers[index % len(control_numbers)],
+                'amount': options['amount'],
+            }).encode()
+            for index in range(options['requests'])
+        ]
+        bodies += random.sample(bodies, int(len(bodies) * options['retries']))
+        random.shuffle(bodies)
+
+        url = options['base_url'].rstrip('/') + options['path']
+        self.stdout.write(f"{len(bodies)} callbacks against {url} with concurrency {options['concurrency']}...")
+        timings, statuses, elapsed = asyncio.run(self.run(url, secret, bodies, options['concurrency']))
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f"  throughput  {len(timings) / elapsed:8.1f} callbacks/s ({elapsed:.2f} s total)")
+        self.stdout.write(f"  latency     mean {statistics.mean(timings):7.1f} ms   p50 {statistics.median(timings):7.1f} ms   p95 {p95:7.1f} ms")
+        self.stdout.write(f"  statuses    {dict(sorted(statuses.items(), key=str))}  (201 posted, 200 retry acknowledged)")
+
+    async def run(self, url, secret, bodies, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+        statuses = {}
+
+        async def callback(http, body):
+            async with semaphore:
+                started = time.perf_counter()
+                headers = {'Content-Type': 'application/json', 'X-Signature': gateway_signature(body, secret)}
+                try:
+                    async with http.post(url, data=body, headers=headers) as response:
+                        await response.read()
+                        code = response.status
+                except aiohttp.ClientError as e:
+                    code = type(e).__name__
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as http:
+            started = time.perf_counter()
+            await asyncio.gather(*(callback(http, body) for body in bodies))
+            elapsed = time.perf_counter() - started
+
+        return timings, statuses, elapsed
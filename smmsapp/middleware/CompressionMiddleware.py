@@ -0,0 +1,138 @@
+import zlib
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+# Content types worth compressing (images, archives etc. are already compressed)
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/pdf',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+class BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class GzipCompressor:
+    def __init__(self):
+        # wbits=31 writes a gzip header and trailer instead of a raw zlib stream
+        self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+COMPRESSORS = {
+    'br': BrotliCompressor,
+    'gzip': GzipCompressor,
+}
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best encoding from an Accept-Encoding header, preferring brotli over gzip."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    candidates = [
+        (accepted.get(coding, wildcard), -index, coding)
+        for index, coding in enumerate(COMPRESSORS)
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+# ---- RESPONSE COMPRESSION (BROTLI / GZIP) -----
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON, PDF and text responses with brotli or gzip depending on the
+    client's Accept-Encoding. Responses smaller than COMPRESSION_MIN_SIZE are
+    sent as is, and streaming responses (FileResponse) are compressed chunk by chunk.
+    """
+
+    def process_response(self, request, response):
+        # Small bodies are not worth the CPU and the extra headers
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        # Already encoded, e.g. precompressed static files served by WhiteNoise
+        if response.has_header('Content-Encoding'):
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressor_class = COMPRESSORS[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(compressor_class(), response.streaming_content)
+            else:
+                response.streaming_content = self.compress_stream(compressor_class(), response.streaming_content)
+            # The compressed size is only known once the stream has been sent
+            del response.headers['Content-Length']
+        else:
+            compressor = compressor_class()
+            compressed_content = compressor.compress(response.content) + compressor.flush()
+            # Return the compressed content only if it's actually shorter
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(compressed_content))
+
+        # A strong ETag no longer matches the encoded bytes, make it weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+    @staticmethod
+    def compress_stream(compressor, sequence):
+        for chunk in sequence:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    async def compress_async_stream(compressor, sequence):
+        async for chunk in sequence:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='smmsapp.scansession'),
+        ),
+        migrations.CreateModel(
+            name='SessionSummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('total_scans', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('penalty_count', models.PositiveIntegerField(default=0)),
+                ('unique_customers', models.PositiveIntegerField(default=0)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('items', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='smmsapp.scansession')),
+            ],
+        ),
+    ]
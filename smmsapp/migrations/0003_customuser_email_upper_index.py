@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('smmsapp', '0002_session_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='customuser_email_upper_idx'),
+        ),
+    ]
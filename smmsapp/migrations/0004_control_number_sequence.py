@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:01
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0003_customuser_email_upper_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ControlNumberSequence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(max_length=4)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='control_number_sequences', to='smmsapp.school')),
+            ],
+            options={
+                'unique_together': {('school', 'period')},
+            },
+        ),
+    ]
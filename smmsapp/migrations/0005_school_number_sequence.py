@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE SEQUENCE IF NOT EXISTS smmsapp_school_number_seq MINVALUE 1 START WITH 10 "
+        "OWNED BY smmsapp_school.number"
+    )
+    # Continue after the highest number already handed out
+    schema_editor.execute(
+        "SELECT setval('smmsapp_school_number_seq', MAX(number)) FROM smmsapp_school "
+        "HAVING MAX(number) IS NOT NULL"
+    )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP SEQUENCE IF EXISTS smmsapp_school_number_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0004_control_number_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
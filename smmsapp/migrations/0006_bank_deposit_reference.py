@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0005_school_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankdeposit',
+            name='reference',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='bankdeposit',
+            name='source',
+            field=models.CharField(default='manual', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='bankdeposit',
+            name='transaction_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='bankdeposit',
+            constraint=models.UniqueConstraint(fields=('source', 'reference'), name='unique_deposit_reference'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:17
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    """History before the ledger is unknown, every existing card opens with its current balance."""
+    RFIDCard = apps.get_model('smmsapp', 'RFIDCard')
+    BalanceLedger = apps.get_model('smmsapp', 'BalanceLedger')
+    opened_at = django.utils.timezone.now()
+    entries = [
+        BalanceLedger(id=uuid.uuid4(), card_id=card_id, entry_type='opening', amount=balance, created_at=opened_at)
+        for card_id, balance in RFIDCard.objects.values_list('id', 'balance').iterator()
+    ]
+    BalanceLedger.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0006_bank_deposit_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceLedger',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening'), ('purchase', 'Purchase'), ('penalty', 'Penalty'), ('deposit', 'Deposit'), ('adjustment', 'Adjustment')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='smmsapp.rfidcard')),
+                ('deposit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='smmsapp.bankdeposit')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='smmsapp.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['card', 'created_at'], name='ledger_card_created_idx'), models.Index(fields=['created_at'], name='ledger_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='smmsapp.rfidcard')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='snapshot_date_idx')],
+                'unique_together': {('card', 'date')},
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
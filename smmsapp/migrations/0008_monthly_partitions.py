@@ -0,0 +1,102 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:22
+
+import re
+from datetime import date, datetime, time
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# (table, partition key) - kept here rather than imported, see smmsapp/partitions.py
+PARTITIONED_TABLES = (
+    ('smmsapp_transaction', 'transaction_date'),
+    ('smmsapp_scanneddata', 'scanned_at'),
+    ('smmsapp_notification', 'created_at'),
+)
+MONTHS_AHEAD = 3
+
+
+def month_bound(month):
+    return timezone.make_aware(datetime.combine(month, time.min)).isoformat()
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def rebuild(cursor, table, column, partitioned):
+    """
+    Recreate `table` as a monthly range partitioned (or a plain) table with the same columns,
+    rows, indexes and foreign keys. Primary keys of partitioned tables must include the
+    partition key, so the key becomes (id, column) and back.
+    """
+    legacy = f"{table}_legacy"
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+    cursor.execute("SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [legacy])
+    foreign_keys = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary", [legacy])
+    indexes = [re.sub(r' ON (ONLY )?\S+ USING ', f' ON "{table}" USING ', row[0]) for row in cursor.fetchall()]
+
+    if partitioned:
+        cursor.execute(f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("{column}")')
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        cursor.execute(f'SELECT MIN("{column}") FROM "{legacy}"')
+        oldest = cursor.fetchone()[0]
+        this_month = timezone.localdate().replace(day=1)
+        month = timezone.localtime(oldest).date().replace(day=1) if oldest else this_month
+        last = this_month
+        for _ in range(MONTHS_AHEAD):
+            last = next_month(last)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "{table}_p{month:%Y_%m}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+                [month_bound(month), month_bound(next_month(month))],
+            )
+            month = next_month(month)
+    else:
+        cursor.execute(f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS)')
+
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+    cursor.execute(f'DROP TABLE "{legacy}" CASCADE')
+    primary_key = f'"id", "{column}"' if partitioned else '"id"'
+    cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY ({primary_key})')
+    for definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{table}" ADD {definition}')
+    for definition in indexes:
+        cursor.execute(definition)
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES:
+            rebuild(cursor, table, column, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES:
+            rebuild(cursor, table, column, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0007_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='balanceledger',
+            name='transaction',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='smmsapp.transaction'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='transaction',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='smmsapp.transaction'),
+        ),
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
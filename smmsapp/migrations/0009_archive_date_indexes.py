@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0008_monthly_partitions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='notification_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scanneddata',
+            index=models.Index(fields=['scanned_at'], name='scanneddata_scanned_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smmsapp', '0009_archive_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('session_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner')], max_length=50)),
+                ('expected_count', models.DecimalField(decimal_places=1, max_digits=8)),
+                ('weeks_observed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='smmsapp.canteenitem')),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='smmsapp.school')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='demandforecast',
+            constraint=models.UniqueConstraint(fields=('date', 'school', 'session_type', 'item'), name='unique_demand_forecast'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Upper
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 import uuid
 import os
 
@@ -27,15 +29,28 @@ class School(models.Model):
     location = models.CharField(max_length=255, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+# School numbers start at 10 and come from a Postgres sequence (migration 0005), so
+# concurrent and bulk school creation never hand out the same number
+SCHOOL_NUMBER_SEQUENCE = 'smmsapp_school_number_seq'
+
+
+def next_school_numbers(count=1):
+    """Reserve `count` school numbers, e.g. before School.objects.bulk_create()."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [SCHOOL_NUMBER_SEQUENCE, count])
+            return [row[0] for row in cursor.fetchall()]
+
+    # Other databases (local sqlite) have no sequences and serialize writes anyway
+    last_number = School.objects.aggregate(last_number=models.Max('number'))['last_number'] or 9
+    return list(range(last_number + 1, last_number + 1 + count))
+
+
 # function to generate school number
 @receiver(pre_save, sender=School)
 def set_number(sender, instance, **kwargs):
     if instance.number is None:
-        last_instance = sender.objects.order_by('-number').first()
-        if last_instance and last_instance.number < 99:
-            instance.number = last_instance.number + 1
-        else:
-            instance.number = 10 
+        instance.number = next_school_numbers()[0]
     
 
 # -------- USER TABLE ----------
@@ -70,6 +85,12 @@ class CustomUser(AbstractUser):
     profile_picture = models.ImageField(upload_to=user_profile_path, null=True, blank=True)
     mobile_number = models.CharField(max_length=15, unique=True, null=True, blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Login by email is case-insensitive (email__iexact)
+            models.Index(Upper('email'), name='customuser_email_upper_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.role}"
     
@@ -91,6 +112,21 @@ class RFIDCard(models.Model):
         return f"Card: {self.card_number} - {self.student_or_staff.first_name}"
 
 
+# ------ CONTROL NUMBER SEQUENCE TABLE ------
+class ControlNumberSequence(models.Model):
+    """Last control number suffix handed out per school and month (see utils.allocate_control_numbers)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='control_number_sequences')
+    period = models.CharField(max_length=4)  # YYMM, control numbers restart every month
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('school', 'period')
+
+    def __str__(self):
+        return f"School {self.school.number} - {self.period}: {self.last_value}"
+
+
 # ------ BANK_DEPOSIT TABLE
 class BankDeposit(models.Model):
     STATUS_CHOICES = [
@@ -103,11 +139,19 @@ class BankDeposit(models.Model):
     control_number = models.ForeignKey(RFIDCard, on_delete=models.CASCADE, to_field='control_number')
     # student_or_ = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'role': 'student'})
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    transaction_date = models.DateTimeField(default=timezone.now)  # When the bank received the money
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     processed_at = models.DateTimeField(null=True, blank=True)
+    source = models.CharField(max_length=50, default='manual')  # Bank statement or gateway the deposit came from
+    reference = models.CharField(max_length=100, null=True, blank=True)  # Reference given by the source
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # A source reports each deposit once, re-imports and callback retries are ignored
+            models.UniqueConstraint(fields=['source', 'reference'], name='unique_deposit_reference'),
+        ]
+
     def __str__(self):
         return f"Deposit: {self.amount} - {self.control_number}"
 
@@ -150,10 +194,56 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_date = models.DateTimeField(auto_now_add=True)
     transaction_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    session = models.ForeignKey('ScanSession', on_delete=models.SET_NULL, null=True, blank=True)  # Session the scan happened in
 
     def __str__(self):
         return f"{self.student_or_staff.username} - {self.item.name} - ${self.amount}"
 
+# ------ BALANCE LEDGER TABLE ------
+class BalanceLedger(models.Model):
+    """Append-only record of every change to RFIDCard.balance, written in the same transaction as the change."""
+    ENTRY_TYPES = [
+        ('opening', 'Opening'),
+        ('purchase', 'Purchase'),
+        ('penalty', 'Penalty'),
+        ('deposit', 'Deposit'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    card = models.ForeignKey(RFIDCard, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=10, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)  # Signed change of the balance
+    # No database constraint: the partitioned transaction table has no unique key on id alone
+    transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
+    deposit = models.ForeignKey(BankDeposit, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['card', 'created_at'], name='ledger_card_created_idx'),
+            models.Index(fields=['created_at'], name='ledger_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type}: {self.amount} - {self.card_id}"
+
+
+# ------ BALANCE SNAPSHOT TABLE ------
+class BalanceSnapshot(models.Model):
+    """Balance of a card at the start of a day, built from the ledger (see ledger.take_balance_snapshots)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    card = models.ForeignKey(RFIDCard, on_delete=models.CASCADE, related_name='balance_snapshots')
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = ('card', 'date')
+        indexes = [models.Index(fields=['date'], name='snapshot_date_idx')]
+
+    def __str__(self):
+        return f"{self.date}: {self.balance} - {self.card_id}"
+
 # ----- NOTIFICATION TABLE ------
 class Notification(models.Model):
     STATUS_CHOICES = [
@@ -171,7 +261,7 @@ class Notification(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE)  # Allow all users, not just parents
-    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, null=True, blank=True)  # Optional
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False)  # Optional, unconstrained as the table is partitioned
     title = models.CharField(max_length=100, null=True, blank=True)
     message = models.TextField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
@@ -179,6 +269,10 @@ class Notification(models.Model):
     type = models.CharField(max_length=15, choices=TYPE_CHOICES, default='message')  # Type of notification
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Dispatch window and retention both select by age
+        indexes = [models.Index(fields=['created_at'], name='notification_created_idx')]
+
     def __str__(self):
         return f"Notification for {self.recipient.first_name}: {self.type} - {self.status}"
 
@@ -217,5 +311,48 @@ class ScannedData(models.Model):
     item = models.ForeignKey(CanteenItem, on_delete=models.CASCADE, null=True, blank=True)
     scanned_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Retention selects by age
+        indexes = [models.Index(fields=['scanned_at'], name='scanneddata_scanned_idx')]
+
     def __str__(self):
         return f"{self.student_or_staff.username} scanned at {self.scanned_at}"
+
+
+# ---- DEMAND FORECAST TABLE -----
+class DemandForecast(models.Model):
+    """Expected number of an item served in a school's session on a date (see forecasting.forecast_demand)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField()
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True)  # Null: users without a school
+    session_type = models.CharField(max_length=50, choices=ScanSession.SESSION_TYPE_CHOICES)
+    item = models.ForeignKey(CanteenItem, on_delete=models.CASCADE)
+    expected_count = models.DecimalField(max_digits=8, decimal_places=1)
+    weeks_observed = models.PositiveIntegerField(default=0)  # Same weekdays the session was held in the history
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'school', 'session_type', 'item'], name='unique_demand_forecast'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.session_type}: {self.expected_count} x {self.item_id}"
+
+
+# ---- SESSION SUMMARY TABLE -----
+class SessionSummary(models.Model):
+    """Totals of a completed scan session, stored once when the session ends."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    session = models.OneToOneField(ScanSession, on_delete=models.CASCADE, related_name='summary')
+    total_scans = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    penalty_count = models.PositiveIntegerField(default=0)
+    unique_customers = models.PositiveIntegerField(default=0)
+    duration = models.DurationField(null=True, blank=True)
+    items = models.JSONField(default=list)  # Per item totals: [{"item_id", "name", "count", "revenue"}]
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.session}"
@@ -0,0 +1,122 @@
+from datetime import date
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from .ledger import day_start
+
+# Tables range partitioned by month on PostgreSQL (migration 0008), with their partition key.
+# Each has a DEFAULT partition so rows outside the pre-created months are never refused.
+PARTITIONED_TABLES = (
+    ('smmsapp_transaction', 'transaction_date'),
+    ('smmsapp_scanneddata', 'scanned_at'),
+    ('smmsapp_notification', 'created_at'),
+)
+
+
+# ---- MONTHS -----
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def month_of_partition(table, name):
+    """The month a partition created by this module covers, None for the default or foreign tables."""
+    suffix = name[len(f"{table}_p"):]
+    if not name.startswith(f"{table}_p") or len(suffix) != 7:
+        return None
+    try:
+        return date(int(suffix[:4]), int(suffix[5:]), 1)
+    except ValueError:
+        return None
+
+
+# ---- POSTGRES CATALOG -----
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+        return cursor.fetchone() is not None
+
+
+def attached_partitions(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# ---- CREATE / DETACH -----
+def create_partition(table, column, month):
+    """
+    Add the partition of `month`. Rows of that month that already fell into the default
+    partition are moved into the new table before it is attached.
+    """
+    name = partition_name(table, month)
+    start, end = day_start(month).isoformat(), day_start(add_months(month, 1)).isoformat()
+
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{table}_default" WHERE "{column}" >= %s AND "{column}" < %s)',
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)', [start, end])
+            return
+
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{table}_default" WHERE "{column}" >= %s AND "{column}" < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', [start, end])
+
+
+def detach_partition(table, name):
+    """Detach a partition; it stays in the database as a plain table for archiving."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+
+
+def manage_partitions(months_ahead=3, retention_months=0, dry_run=False):
+    """
+    Make sure every partitioned table has its partitions up to `months_ahead` months from
+    now, and detach monthly partitions older than `retention_months` (0 keeps them all).
+    Returns {table: {'created': [...], 'detached': [...]}}.
+    """
+    this_month = timezone.localdate().replace(day=1)
+    report = {}
+
+    for table, column in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            continue
+        attached = attached_partitions(table)
+        months = {month_of_partition(table, name): name for name in attached}
+        months.pop(None, None)
+
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(this_month, offset)
+            if month not in months:
+                if not dry_run:
+                    create_partition(table, column, month)
+                created.append(partition_name(table, month))
+
+        detached = []
+        if retention_months:
+            oldest_kept = add_months(this_month, -retention_months)
+            for month, name in sorted(months.items()):
+                if month < oldest_kept:
+                    if not dry_run:
+                        detach_partition(table, name)
+                    detached.append(name)
+
+        report[table] = {'created': created, 'detached': detached}
+    return report
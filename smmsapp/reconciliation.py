@@ -0,0 +1,126 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.models import OuterRef, Subquery, Sum, F
+from django.utils import timezone
+from .models import RFIDCard, Transaction, BankDeposit, BalanceLedger
+
+REPORT_COLUMNS = (
+    'school', 'card_id', 'card_number', 'control_number', 'balance',
+    'ledger_balance', 'expected_balance', 'difference',
+)
+
+
+# ---- RECONCILE ONE SCHOOL -----
+# A card's expected balance is rebuilt from the source records: its opening and admin
+# adjustment ledger entries, plus processed deposits, minus scan transactions since it was
+# opened (history before the ledger is part of the opening balance). Each school is one
+# partition: four grouped queries, run in a worker process.
+
+def opened_at(card_field):
+    return Subquery(
+        BalanceLedger.objects.filter(card=OuterRef(card_field), entry_type='opening')
+                             .order_by('created_at').values('created_at')[:1]
+    )
+
+
+def grouped_totals(queryset, key, amount='amount'):
+    return dict(queryset.values(key).annotate(total=Sum(amount)).values_list(key, 'total').order_by())
+
+
+def reconcile_school(school_id):
+    """Return (cards checked, discrepancy rows) for the cards of one school (None: no school)."""
+    cards = RFIDCard.objects.filter(student_or_staff__school_id=school_id)
+    card_ids = cards.values('id')
+
+    ledger = grouped_totals(BalanceLedger.objects.filter(card__in=card_ids), 'card')
+    base = grouped_totals(BalanceLedger.objects.filter(card__in=card_ids, entry_type__in=['opening', 'adjustment']), 'card')
+    spent = grouped_totals(
+        Transaction.objects.filter(rfid_card__in=card_ids, transaction_status__in=['successful', 'penalt'])
+                           .annotate(opened=opened_at('rfid_card')).filter(transaction_date__gte=F('opened')),
+        'rfid_card',
+    )
+    deposited = grouped_totals(
+        BankDeposit.objects.filter(control_number__in=cards.values('control_number'), status='processed')
+                           .annotate(opened=opened_at('control_number__id')).filter(processed_at__gte=F('opened')),
+        'control_number',
+    )
+
+    checked = 0
+    rows = []
+    for card_id, card_number, control_number, balance in cards.values_list('id', 'card_number', 'control_number', 'balance').iterator():
+        checked += 1
+        ledger_balance = ledger.get(card_id, Decimal('0.00'))
+        expected = base.get(card_id, 0) + deposited.get(control_number, 0) - spent.get(card_id, 0)
+        if balance != expected or balance != ledger_balance:
+            rows.append({
+                'school': str(school_id) if school_id else '',
+                'card_id': str(card_id),
+                'card_number': card_number,
+                'control_number': control_number,
+                'balance': balance,
+                'ledger_balance': ledger_balance,
+                'expected_balance': expected,
+                'difference': balance - expected,
+            })
+    return checked, rows
+
+
+# ---- RECONCILE ALL CARDS -----
+def reconciled_school_ids():
+    """Schools with cards, None standing for cards whose owner has no school."""
+    return list(RFIDCard.objects.values_list('student_or_staff__school_id', flat=True).distinct().order_by())
+
+
+def write_report(results, output=None):
+    """Write the discrepancies of the per school (checked, rows) results to a CSV report and summarize them."""
+    rows = sorted((row for _, school_rows in results for row in school_rows), key=lambda row: (row['school'], row['control_number']))
+    output = output or os.path.join(
+        settings.MEDIA_ROOT, 'reconciliation', f"reconciliation-{timezone.localtime():%Y%m%d-%H%M%S}.csv"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', newline='') as report:
+        writer = csv.DictWriter(report, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return {
+        'schools': len(results),
+        'cards': sum(checked for checked, _ in results),
+        'discrepancies': len(rows),
+        'total_difference': str(sum((row['difference'] for row in rows), Decimal('0.00'))),
+        'report': output,
+    }
+
+
+def init_worker():
+    django.setup()
+
+
+def reconcile_balances(workers=None, output=None):
+    """
+    Reconcile every card, one school per task over a process pool, and write the cards that
+    disagree to a CSV report. Runs the schools one after another where a pool cannot start
+    (e.g. inside a daemonic celery worker, the nightly task fans out celery tasks instead).
+    """
+    workers = workers or settings.RECONCILE_WORKERS
+    school_ids = reconciled_school_ids()
+
+    results = None
+    if workers > 1 and len(school_ids) > 1:
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = list(pool.map(reconcile_school, school_ids))
+        except (AssertionError, BrokenProcessPool, OSError):
+            results = None
+    if results is None:
+        results = [reconcile_school(school_id) for school_id in school_ids]
+
+    return write_report(results, output)
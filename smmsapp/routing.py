@@ -0,0 +1,6 @@
+from django.urls import path
+from .consumers import ScanConsumer
+
+websocket_urlpatterns = [
+    path('ws/scan/', ScanConsumer.as_asgi(), name='ws-scan'),
+]
@@ -0,0 +1,190 @@
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction as db_transaction
+from django.utils.timezone import now
+from rest_framework import status
+from .caching import bump_model_versions
+from .models import ScanSession, RFIDCard, CanteenItem, ScannedData, Transaction, ParentStudent, Notification, BalanceLedger
+
+INSUFFICIENT_MEAL_LIMIT = 10
+PENALTY_AMOUNT = 500
+
+
+# Blocking work of the async scan endpoints (transactions, row locks, serializers) runs
+# here instead of on the event loop. The pool size bounds the database connections one
+# ASGI worker opens.
+scan_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_SCAN_THREADS, thread_name_prefix='smms-scan')
+
+
+def run_blocking(func, *args):
+    def call():
+        # Pool threads live outside the request cycle, recycle their connections like a request would
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False, executor=scan_executor)()
+
+
+class ScanError(Exception):
+    """A scan that was refused, carries the API error code and HTTP status."""
+
+    def __init__(self, code, message, http_status):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.http_status = http_status
+
+
+# ---- SCAN RFID CARD -----
+# Shared by the sync (DRF) and async scan endpoints. Runs in one transaction with the
+# card row locked, so two terminals scanning the same card cannot both spend its balance.
+def process_scan(session_id, card_number, item_id):
+    try:
+        session = ScanSession.objects.get(id=session_id, status='active')
+    except (ScanSession.DoesNotExist, ValidationError):
+        raise ScanError(114, 'Active session not found', status.HTTP_404_NOT_FOUND)
+
+    with db_transaction.atomic():
+        try:
+            rfid_card = RFIDCard.objects.select_for_update(of=('self',)).select_related('student_or_staff') \
+                                        .get(card_number=card_number, is_active=True)
+        except RFIDCard.DoesNotExist:
+            raise ScanError(115, 'Invalid or inactive RFID card', status.HTTP_404_NOT_FOUND)
+        student_or_staff = rfid_card.student_or_staff
+
+        try:
+            item = CanteenItem.objects.get(id=item_id)
+        except (CanteenItem.DoesNotExist, ValidationError):
+            raise ScanError(116, 'Invalid canteen item', status.HTTP_404_NOT_FOUND)
+
+        # Check if student already purchase the item on same session
+        if ScannedData.objects.filter(session=session, student_or_staff=student_or_staff, rfid_card=rfid_card, item=item).exists():
+            raise ScanError(119, 'Already purchase this item', status.HTTP_400_BAD_REQUEST)
+
+        # Check if student has exceeded 10 insufficient meals
+        if rfid_card.insufficient_meal_count >= INSUFFICIENT_MEAL_LIMIT:
+            raise ScanError(118, 'Meal denied. Customer exceeded allowed insufficient meals.', status.HTTP_403_FORBIDDEN)
+
+        # Deduct balance if sufficient funds
+        if rfid_card.balance >= item.price:
+            amount = item.price
+            rfid_card.balance -= amount
+            trans_status = 'successful'
+            title = "Transaction Report"
+            if student_or_staff.role == 'student':
+                message = f"Your child {student_or_staff.first_name} purchased {item.name} with price {item.price}. The available balance is {rfid_card.balance}"
+            else:
+                message = f"You purchased {item.name} with price {item.price}. The available balance is {rfid_card.balance}. If is not you contact with our support imidietly"
+        else:
+            # Allow the meal but apply penalty (-500)
+            amount = item.price + PENALTY_AMOUNT
+            rfid_card.balance -= amount
+            rfid_card.insufficient_meal_count += 1
+            trans_status = 'penalt'
+            title = "WARNING: Transaction Penalt"
+            if student_or_staff.role == 'student':
+                message = f"Your child {student_or_staff.first_name} has purchase {item.name} with price {item.price} and penalt of -500 Tsh.Available Balance is {rfid_card.balance}. \nWarning: Count left {rfid_card.insufficient_meal_count}/10 before your child's card blocked, Please recharge to avoid further penalts"
+            else:
+                message = f"Your purchase {item.name} with price {item.price} and penalt of -500 Tsh.Available Balance is {rfid_card.balance}. \nWarning: Count left {rfid_card.insufficient_meal_count}/10 before your card blocked, Please recharge to avoid further penalts"
+
+        rfid_card.save(update_fields=['balance', 'insufficient_meal_count', 'updated_at'])
+
+        # Store scanned data
+        scanned_data = ScannedData.objects.create(
+            session=session,
+            student_or_staff=student_or_staff,
+            rfid_card=rfid_card,
+            item=item
+        )
+
+        # Log transaction
+        transaction = Transaction.objects.create(
+            student_or_staff=student_or_staff,
+            rfid_card=rfid_card,
+            item=item,
+            amount=amount,
+            transaction_status=trans_status,
+            session=session
+        )
+        ledger_entries = [BalanceLedger(card=rfid_card, entry_type='purchase', amount=-item.price, transaction=transaction)]
+        if trans_status == 'penalt':
+            ledger_entries.append(BalanceLedger(card=rfid_card, entry_type='penalty', amount=-PENALTY_AMOUNT, transaction=transaction))
+        BalanceLedger.objects.bulk_create(ledger_entries)
+
+        # Notify parent
+        Notification.objects.bulk_create([
+            Notification(
+                title=title,
+                recipient_id=parent_id,
+                transaction=transaction,
+                message=message,
+                status='pending',
+                type='transaction'
+            )
+            for parent_id in ParentStudent.objects.filter(student=student_or_staff).values_list('parent_id', flat=True)
+        ])
+
+    return scanned_data
+
+
+# ---- UNBLOCK RECHARGED CARDS -----
+# A card is refused at INSUFFICIENT_MEAL_LIMIT penalty meals. Once its balance is above zero
+# again the counter is reset, a batch at a time with one UPDATE, by deposits and the
+# periodic unblock_recharged_cards task.
+UNBLOCK_BATCH_SIZE = 1000
+
+
+def unblock_cards(cards=None, batch_size=UNBLOCK_BATCH_SIZE):
+    """Reset insufficient_meal_count of recharged cards (optionally within `cards`). Returns the number reset."""
+    cards = RFIDCard.objects.all() if cards is None else cards
+    candidates = cards.filter(insufficient_meal_count__gt=0, balance__gt=0).order_by('id')
+    reset = 0
+
+    while True:
+        with db_transaction.atomic():
+            # Locked, so a scan cannot spend the balance between the check and the reset
+            rows = list(candidates.select_for_update(of=('self',)).values_list(
+                'id', 'insufficient_meal_count', 'control_number', 'student_or_staff_id',
+                'student_or_staff__role', 'student_or_staff__first_name', 'student_or_staff__last_name',
+            )[:batch_size])
+            if not rows:
+                break
+
+            RFIDCard.objects.filter(id__in=[row[0] for row in rows]).update(insufficient_meal_count=0, updated_at=now())
+            Notification.objects.bulk_create(unblock_notifications(
+                [row for row in rows if row[1] >= INSUFFICIENT_MEAL_LIMIT]
+            ))
+        reset += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if reset:
+        # update()/bulk_create() send no post_save, invalidate cached responses once committed
+        db_transaction.on_commit(lambda: bump_model_versions(RFIDCard, Notification))
+    return reset
+
+
+def unblock_notifications(rows):
+    """Unsaved notifications to the parents (or the staff member) of cards that were blocked."""
+    student_ids = [row[3] for row in rows if row[4] == 'student']
+    parents = {}
+    for student_id, parent_id in ParentStudent.objects.filter(student_id__in=student_ids).values_list('student_id', 'parent_id'):
+        parents.setdefault(student_id, []).append(parent_id)
+
+    notifications = []
+    for _, _, control_number, owner_id, role, first_name, last_name in rows:
+        if role == 'student':
+            recipients = parents.get(owner_id, [])
+            message = f"Your child {first_name} {last_name}'s meal card (Control Number: {control_number}) is unblocked after the recharge."
+        else:
+            recipients = [owner_id]
+            message = f"Your meal card (Control Number: {control_number}) is unblocked after the recharge."
+        notifications.extend(
+            Notification(recipient_id=recipient_id, title="Meal Card Unblocked", message=message, status='pending', type='reminder')
+            for recipient_id in recipients
+        )
+    return notifications
@@ -1,4 +1,5 @@
 import json
+import re
 from uuid import UUID
 from rest_framework import serializers
 from ..models import CustomUser, School
@@ -19,6 +20,23 @@ class AuthUserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'mobile_number', 'role', 'profile_picture', 'first_name', 'middle_name', 'last_name', 'is_superuser', 'school']
 
 #  ----- LOGIN SERIALIZER ----- 
+PHONE_PATTERN = re.compile(r'^\+?[\d\s\-()]{7,20}$')
+
+
+def login_lookup(identifier):
+    """
+    Classify a login identifier (username, email or mobile number) so it is resolved
+    with one indexed query instead of an OR across every column.
+    """
+    if '@' in identifier:
+        # Usernames may contain '@' too; email uses the UPPER(email) index
+        return Q(email__iexact=identifier) | Q(username=identifier)
+    if PHONE_PATTERN.match(identifier):
+        normalized = re.sub(r'[\s\-()]', '', identifier)
+        return Q(mobile_number__in={identifier, normalized}) | Q(username=identifier)
+    return Q(username=identifier)
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
@@ -28,17 +46,38 @@ class LoginSerializer(serializers.Serializer):
         username = data.get('username')
         password = data.get('password')
 
-        user = CustomUser.objects.filter(
-            Q(username=username) | Q(mobile_number=username)
-        ).first()
+        user = CustomUser.objects.filter(login_lookup(username)).select_related('school').first()
 
-        if user and user.check_password(password):
-            data['user'] = user
-        # else:
-        #     raise serializers.ValidationError("Invalid credentials")
+        # The view answers invalid credentials itself
+        data['user'] = user if user and user.check_password(password) else None
 
         return data
 
+# Shared with the bulk user import (smmsapp/bulk.py)
+def generate_password(last_name):
+    """Generate a strong random password."""
+    digits = string.digits
+    special_chars = "!@#$%&*"  # Limit special characters
+
+    password = [
+        random.choice(digits),
+        random.choice(special_chars)
+    ]
+
+    all_chars = digits + special_chars
+    password += random.choices(all_chars, k=1)  # Ensure 8-character length
+    random.shuffle(password)
+
+    return f'{last_name}{"".join(password)}'
+
+
+def student_username(first_name, last_name, school_name=''):
+    """Students get first_name.last_name.school_name + current year as username"""
+    base_username = f"{first_name.lower()}.{last_name.lower()}.{school_name.lower()}"
+    year = datetime.now().year
+    return f"{base_username}{year}"
+
+
 #  ----- USER CREATE SERIALIAZER ----
 class UserCreateSerializer(serializers.ModelSerializer):
     username = serializers.CharField(write_only=True, required=False)
@@ -62,27 +101,11 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     # Generate strong password
     def generate_password(self, last_name):
-        """Generate a strong random password."""
-        digits = string.digits
-        special_chars = "!@#$%&*"  # Limit special characters
-
-        password = [
-            random.choice(digits),
-            random.choice(special_chars)
-        ]
-
-        all_chars = digits + special_chars
-        password += random.choices(all_chars, k=1)  # Ensure 8-character length
-        random.shuffle(password)
-
-        return f'{last_name}{"".join(password)}'
+        return generate_password(last_name)
 
     # Generate unique username for student
     def generate_username(self, first_name, last_name, school_name):
-        """Generate a unique username using first_name.last_name + 3 random digits"""
-        base_username = f"{first_name.lower()}.{last_name.lower()}.{school_name.lower()}"
-        year = datetime.now().year
-        username = f"{base_username}{year}"
+        username = student_username(first_name, last_name, school_name)
         if CustomUser.objects.filter(username=username).exists():
             raise serializers.ValidationError({"code": 108, "message": "This user is already exist"})
         return username
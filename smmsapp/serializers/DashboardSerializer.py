@@ -23,4 +23,14 @@ class SalesSummarySerializer(serializers.Serializer):
 # ---- CHART TREAND SERIALIZER -----
 class WeeklySalesSerializer(serializers.Serializer):
     date = serializers.DateField()
-    sales_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    sales_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+# ---- DEMAND FORECAST SERIALIZER -----
+class DemandForecastSerializer(serializers.Serializer):
+    school = serializers.UUIDField(source='school_id', allow_null=True)
+    school_name = serializers.CharField(source='school.name', default=None)
+    session_type = serializers.CharField()
+    item = serializers.UUIDField(source='item_id')
+    item_name = serializers.CharField(source='item.name')
+    expected_count = serializers.DecimalField(max_digits=8, decimal_places=1)
+    weeks_observed = serializers.IntegerField()
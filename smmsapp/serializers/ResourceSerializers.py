@@ -1,18 +1,105 @@
 from rest_framework import serializers
 from ..models import *
-from django.db.models import Q
+from ..utils import attach_session_totals, allocate_control_numbers, card_created_notifications
+from .SessionSerializers import SessionHistorySerializer
+from django.core.paginator import Paginator
+from django.db import transaction as db_transaction
+from django.db.models import Q, Prefetch
 from datetime import datetime
 import random
 
+
+# ---- SPARSE FIELDSETS ----
+def parse_fieldset(value):
+    """Turn `a,b.c` (or a list of names) into a list of field paths."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def split_fieldset(paths):
+    """Split field paths into top level names and the paths for each nested field."""
+    top, nested = set(), {}
+    for path in paths:
+        name, _, rest = path.partition('.')
+        top.add(name)
+        if rest:
+            nested.setdefault(name, []).append(rest)
+    return top, nested
+
+
+def requested_fieldset(request):
+    """`fields`/`expand` from the query string or body, as serializer keyword arguments."""
+    return {
+        'fields': DynamicFieldsMixin.get_request_fieldset(request, 'fields'),
+        'expand': DynamicFieldsMixin.get_request_fieldset(request, 'expand'),
+    }
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients ask only for what they render with `fields=` and `expand=`,
+    sent in the query string or the request body.
+
+    - no parameter: the full representation, as before
+    - fields: only the listed fields, `rfid_card.balance` narrows nested serializers
+    - expand: heavy fields listed in Meta.expandable_fields are only included
+      when expanded (or listed in fields) once either parameter is given
+
+    Dropped fields are removed from `self.fields`, so their SerializerMethodField
+    queries never run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if fields is None and expand is None and request is not None:
+            fields = self.get_request_fieldset(request, 'fields')
+            expand = self.get_request_fieldset(request, 'expand')
+
+        if fields is not None or expand is not None:
+            self.apply_fieldset(parse_fieldset(fields) or None, parse_fieldset(expand))
+
+    @staticmethod
+    def get_request_fieldset(request, name):
+        value = request.query_params.get(name)
+        if value is None and hasattr(request.data, 'get'):
+            value = request.data.get(name)
+        return value
+
+    def apply_fieldset(self, fields=None, expand=()):
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        top_expand, nested_expand = split_fieldset(expand)
+
+        if fields is None:
+            allowed, nested_fields = set(self.fields) - expandable, {}
+        else:
+            allowed, nested_fields = split_fieldset(fields)
+        allowed |= top_expand & expandable
+
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+        # Narrow nested serializers with their part of the fieldset
+        for name, field in self.fields.items():
+            field = getattr(field, 'child', field)
+            if isinstance(field, DynamicFieldsMixin):
+                field.apply_fieldset(nested_fields.get(name), nested_expand.get(name, []))
+
 # ---- SCHOOL INFO ----
-class SchoolSerializer(serializers.ModelSerializer):
+class SchoolSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = School
         fields = ['id', 'name', 'location', 'number']
 
 
 # ----- USER INFO ----
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     school = serializers.CharField(source='school.name',read_only=True)
     class Meta: 
         model = CustomUser
@@ -20,7 +107,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # ------ STUDENT INFO ----
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     school = serializers.CharField(source='school.name',read_only=True)
     class Meta: 
         model = CustomUser
@@ -28,7 +115,7 @@ class StudentSerializer(serializers.ModelSerializer):
         
         
 # ------ STAFF INFO ----
-class StaffSerializer(serializers.ModelSerializer):
+class StaffSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     school = serializers.CharField(source='school.name',read_only=True)
     class Meta: 
         model = CustomUser
@@ -36,7 +123,7 @@ class StaffSerializer(serializers.ModelSerializer):
 
 
 # ------ PARENT INFO -----
-class ParentSerializer(serializers.ModelSerializer):
+class ParentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # school = SchoolSerializer(read_only = True)
     class Meta: 
         model = CustomUser
@@ -44,7 +131,7 @@ class ParentSerializer(serializers.ModelSerializer):
 
 
 # ----- TRANSACTION INFO ------
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.SerializerMethodField()
     card_number = serializers.CharField(source='rfid_card.card_number', read_only=True)
     item_name = serializers.CharField(source='item.name', read_only=True)
@@ -57,29 +144,42 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 
 # ---- SESSION INFO -----
-class ScanSessionSerializer(serializers.ModelSerializer):
+class ScanSessionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ScanSession
         fields = ['id','status', 'type', 'start_at','end_at', 'updated_at']
 
 
 # ------ RFID Card INFO -----
-class RFIDCardSerializer(serializers.ModelSerializer):
+class RFIDCardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_or_staff = UserSerializer(read_only=True)
     class Meta:
         model = RFIDCard
         fields = ['id','balance', 'is_active','control_number','card_number','issued_date','student_or_staff', 'created_at']
+        expandable_fields = ['student_or_staff']
 
 
 # ----- ITEM INFO ----
-class CanteenItemSerializer(serializers.ModelSerializer):
+class CanteenItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CanteenItem
         fields = '__all__'
 
 
+# Number of latest transactions shown on student and staff details
+RECENT_TRANSACTIONS = 10
+
+def recent_transactions_prefetch(limit=RECENT_TRANSACTIONS):
+    """
+    Latest `limit` transactions of every customer in a single query. Django runs a
+    sliced Prefetch as a ROW_NUMBER() window partitioned by customer ("top N per student").
+    """
+    transactions = Transaction.objects.select_related('rfid_card', 'item').order_by('-transaction_date')
+    return Prefetch('transaction_set', queryset=transactions[:limit], to_attr='recent_transactions')
+
+
 # ----- FULL STUDENT DETAILS -----
-class FullStudentSerializer(serializers.ModelSerializer):
+class FullStudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     rfid_card = RFIDCardSerializer(source = 'rfidcard', read_only = True)
     school = serializers.CharField(source='school.name',read_only=True)
     school_id = serializers.CharField(source='school.id', read_only=True)
@@ -90,18 +190,38 @@ class FullStudentSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ['id','first_name','middle_name',  'last_name','gender', 'class_room',
                   'school', 'school_id','profile_picture','transactions', 'rfid_card', 'parents']
+        expandable_fields = ['transactions', 'rfid_card', 'parents']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, **fieldset):
+        """Load cards, schools, parents and recent transactions for all students in a fixed number of queries."""
+        fields = cls(**fieldset).fields
+        queryset = queryset.select_related('school')
+        if 'rfid_card' in fields:
+            queryset = queryset.select_related('rfidcard')
+        if 'parents' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('parents', queryset=ParentStudent.objects.select_related('parent'), to_attr='parent_links')
+            )
+        if 'transactions' in fields:
+            queryset = queryset.prefetch_related(recent_transactions_prefetch())
+        return queryset
 
     def get_parents(self, obj):
-        parents = ParentStudent.objects.filter(student=obj).select_related('parent')
+        parents = getattr(obj, 'parent_links', None)
+        if parents is None:
+            parents = ParentStudent.objects.filter(student=obj).select_related('parent')
         return ParentSerializer([parent.parent for parent in parents], many = True).data
         
     def get_transactions(self, obj):
-        transactions = Transaction.objects.filter(student_or_staff=obj).order_by('-transaction_date')[:10]
+        transactions = getattr(obj, 'recent_transactions', None)
+        if transactions is None:
+            transactions = Transaction.objects.filter(student_or_staff=obj).order_by('-transaction_date')[:RECENT_TRANSACTIONS]
         return TransactionSerializer(transactions, many=True).data
 
 
 # ----- FULL STAFF DETAILS -----
-class FullStaffSerializer(serializers.ModelSerializer):
+class FullStaffSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     rfid_card = RFIDCardSerializer(source = 'rfidcard', read_only = True)
     school = serializers.CharField(source='school.name',read_only=True)
     school_id = serializers.CharField(source='school.id', read_only=True)
@@ -111,14 +231,27 @@ class FullStaffSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ['id','first_name','middle_name', 'last_name','gender', 'email', 'username', 'mobile_number',
                   'school', 'school_id','profile_picture', 'rfid_card', 'transactions', ]
+        expandable_fields = ['rfid_card', 'transactions']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, **fieldset):
+        fields = cls(**fieldset).fields
+        queryset = queryset.select_related('school')
+        if 'rfid_card' in fields:
+            queryset = queryset.select_related('rfidcard')
+        if 'transactions' in fields:
+            queryset = queryset.prefetch_related(recent_transactions_prefetch())
+        return queryset
         
     def get_transactions(self, obj):
-        transactions = Transaction.objects.filter(student_or_staff=obj).order_by('-transaction_date')[:10]
+        transactions = getattr(obj, 'recent_transactions', None)
+        if transactions is None:
+            transactions = Transaction.objects.filter(student_or_staff=obj).order_by('-transaction_date')[:RECENT_TRANSACTIONS]
         return TransactionSerializer(transactions, many=True).data
     
 
 # ----- FULL PARENT DETAILS ----
-class FullParentSerializer(serializers.ModelSerializer):
+class FullParentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     students = serializers.SerializerMethodField()
     school = serializers.CharField(source='school.name',read_only=True)
 
@@ -126,29 +259,72 @@ class FullParentSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ['id','first_name', 'username','middle_name',  'last_name', 'parent_type','email', 'mobile_number','gender',
                   'school', 'students']
+        expandable_fields = ['students']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, **fieldset):
+        fields = cls(**fieldset).fields
+        queryset = queryset.select_related('school')
+        if 'students' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('children', queryset=ParentStudent.objects.select_related('student__school'), to_attr='student_links')
+            )
+        return queryset
         
     def get_students(self, obj):
-        students = ParentStudent.objects.filter(parent=obj).select_related('student')
+        students = getattr(obj, 'student_links', None)
+        if students is None:
+            students = ParentStudent.objects.filter(parent=obj).select_related('student__school')
         return StudentSerializer([student.student for student in students],many=True).data
     
 
+# ----- OPERATOR SESSION HISTORY ----
+SESSION_HISTORY_PAGE_SIZE = 10
+
+
 # ----- FULL OPERATOR DETAILS ----
-class FullOperatorSerializer(serializers.ModelSerializer):
+class FullOperatorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Operator details with one page of session history, pass `sessions_page` in the context to move through it."""
     sessions = serializers.SerializerMethodField()
+    sessions_page = serializers.SerializerMethodField()
     school = serializers.CharField(source='school.name',read_only=True)
     school_id = serializers.CharField(source='school.id', read_only=True)
 
     class Meta:
         model = CustomUser
         fields = ['id','first_name','middle_name', 'last_name','username','email', 'mobile_number','gender',
-                  'school', 'sessions','school_id']
+                  'school', 'sessions', 'sessions_page', 'school_id']
+        expandable_fields = ['sessions', 'sessions_page']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_pages = {}
+
+    def get_session_page(self, obj):
+        # Shared by `sessions` and `sessions_page` so the page is only queried once
+        cache = self._session_pages
+        if obj.pk not in cache:
+            sessions = ScanSession.objects.filter(operator=obj).select_related('summary').order_by('-start_at')
+            page = Paginator(sessions, SESSION_HISTORY_PAGE_SIZE).get_page(self.context.get('sessions_page', 1))
+            # Stored summaries for completed sessions, one grouped query for the rest
+            page.object_list = attach_session_totals(page.object_list)
+            cache[obj.pk] = page
+        return cache[obj.pk]
         
     def get_sessions(self, obj):
-        sessions = ScanSession.objects.filter(operator=obj).select_related('operator')
-        return ScanSessionSerializer([session for session in sessions],many=True).data
+        return SessionHistorySerializer(self.get_session_page(obj), many=True).data
+
+    def get_sessions_page(self, obj):
+        page = self.get_session_page(obj)
+        return {
+            'page': page.number,
+            'page_size': SESSION_HISTORY_PAGE_SIZE,
+            'num_pages': page.paginator.num_pages,
+            'count': page.paginator.count,
+        }
     
 # ----- FULL ADMIN DETAILS ------
-class FullAdminSerializer(serializers.ModelSerializer):
+class FullAdminSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     school = serializers.CharField(source='school.name', read_only=True)
     school_id = serializers.CharField(source='school.id', read_only=True)
 
@@ -165,62 +341,51 @@ class CreateRFIDCardSerializer(serializers.ModelSerializer):
         fields = ['id', 'balance', 'student_or_staff', 'is_active', 'control_number', 'card_number', 'issued_date']
         read_only_fields = ['control_number']  # Ensure control_number isn't required in requests
 
-    # Generate control number automatically
-    def generate_control_number(self, school_number):
-        # Generate control number in the format STU{year}{month}{random6digit}
-        year = datetime.now().year % 100 # get a last two digits
-        month = f"{datetime.now().month:02d}"  # Ensure month is always two digits (e.g., 01, 02)
-        date = f"{datetime.now().day:02d}"
-        random4digit = random.randint(1000, 9999)
-        return f"{school_number}{year}{month}{random4digit}"
-
     # Create a new RFID card
     def create(self, validated_data):
         student_or_staff = validated_data.get('student_or_staff')
 
         # Ensure the student_or_staff has a school assigned
-        if student_or_staff and student_or_staff.school:
-            school_number = student_or_staff.school.number  # Get the school number
-        else:
+        if not (student_or_staff and student_or_staff.school):
             raise serializers.ValidationError({"school_number": "Student or staff must belong to a school."})
 
-        # school_number = validated_data.pop('school_number')
-        control_number = self.generate_control_number(school_number)
-        validated_data['control_number'] = control_number
-        rfid = RFIDCard.objects.create(is_active=False, **validated_data)
-
-        if rfid.student_or_staff.role == 'student':
-            # Notify parent
-            parents = ParentStudent.objects.filter(student=rfid.student_or_staff)
-            for parent_entry in parents:
-                Notification.objects.create(
-                    title=f"{rfid.student_or_staff.first_name}'s Card Creation",
-                    recipient=parent_entry.parent,
-                    message=f"Your {rfid.student_or_staff.first_name} {rfid.student_or_staff.last_name}'s meal card is created. \nCard Number: {rfid.card_number}, \nControl Number: {rfid.control_number}, \nBalance: Tsh. {rfid.balance}.",
-                    status='pending',
-                    type='reminder'
-                )
-        else: 
-            # Notify staff
-            Notification.objects.create(
-                title=f"Meal Card Creation",
-                recipient=rfid.student_or_staff,
-                message=f"Your meal card is created. \nCard Number: {rfid.card_number}, \nControl Number: {rfid.control_number}, \nBalance: Tsh. {rfid.balance}.",
-                status='pending',
-                type='reminder'
-            )
-        
+        # Control numbers come from the school's monthly sequence, see allocate_control_numbers
+        validated_data['control_number'] = allocate_control_numbers(student_or_staff.school)[0]
+        with db_transaction.atomic():
+            rfid = RFIDCard.objects.create(is_active=False, **validated_data)
+            BalanceLedger.objects.create(card=rfid, entry_type='opening', amount=rfid.balance)
+
+        # Notify parents (students) or the staff member
+        parent_ids = ParentStudent.objects.filter(student=rfid.student_or_staff).values_list('parent_id', flat=True)
+        Notification.objects.bulk_create(card_created_notifications(rfid, parent_ids))
+
         return rfid
 
      # Update RFID Card (Prevents control_number changes)
     def update(self, instance, validated_data):
         
         validated_data.pop('control_number', None)  # Ignore control_number if provided
-        return super().update(instance, validated_data)
+
+        with db_transaction.atomic():
+            if 'balance' in validated_data:
+                # Record the change against the locked current balance, scans may have moved it
+                current = RFIDCard.objects.select_for_update().values_list('balance', flat=True).get(pk=instance.pk)
+                change = validated_data['balance'] - current
+                if change:
+                    BalanceLedger.objects.create(card=instance, entry_type='adjustment', amount=change)
+            return super().update(instance, validated_data)
     
 
+# ----- SERIALIZER FOR BULK CARD ISSUANCE ------
+class BulkRFIDCardEntrySerializer(serializers.Serializer):
+    student_or_staff = serializers.UUIDField()
+    card_number = serializers.CharField(max_length=50)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=0)
+    issued_date = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+
 # ----- SERIALIZER FOR NOTIFICATIONS ------
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     recipient = serializers.SerializerMethodField()
     class Meta:
         model = Notification
@@ -9,6 +9,17 @@ class ScanSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'start_at', 'end_at']
 
 
+# ---- SESSION HISTORY SERIALIZER -----
+# Sessions with the totals set by utils.attach_session_totals (operator history and details)
+class SessionHistorySerializer(ScanSessionSerializer):
+    scan_count = serializers.IntegerField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    unique_customers = serializers.IntegerField(read_only=True)
+
+    class Meta(ScanSessionSerializer.Meta):
+        fields = ScanSessionSerializer.Meta.fields + ['updated_at', 'scan_count', 'revenue', 'unique_customers']
+
+
 # ----- SCANNED DATA SERIALIZER ----
 class ScannedDataSerializer(serializers.ModelSerializer):
     student_name = serializers.SerializerMethodField()
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import bump_model_versions, invalidate_cached_user
+from .models import CustomUser
+
+
+# Invalidate cached view responses built from a model whenever one of its rows changes.
+# Bumped once the write commits: bumped earlier, a concurrent request could rebuild the
+# response from the uncommitted state and cache it under the new version.
+@receiver(post_save, dispatch_uid='smmsapp_bump_model_version_on_save')
+@receiver(post_delete, dispatch_uid='smmsapp_bump_model_version_on_delete')
+def bump_model_version(sender, using=None, **kwargs):
+    if sender._meta.app_label == 'smmsapp':
+        transaction.on_commit(lambda: bump_model_versions(sender), using=using)
+
+
+# Role, active status and password changes must reach CachedJWTAuthentication as soon as they
+# commit (invalidated earlier, a concurrent request could cache the old user again)
+@receiver(post_save, sender=CustomUser, dispatch_uid='smmsapp_invalidate_cached_user_on_save')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='smmsapp_invalidate_cached_user_on_delete')
+def invalidate_user(sender, instance, using=None, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id), using=using)
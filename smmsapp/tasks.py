@@ -1,12 +1,13 @@
 import os
 import logging
+from datetime import timedelta
 from celery import shared_task
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.conf import settings
 from django.utils.timezone import now
 from pyfcm import FCMNotification
 from dotenv import load_dotenv
-from .models import Notification
+from .models import Notification, BankDeposit
 from django.template.loader import render_to_string
 
 # Load .env variables
@@ -28,6 +29,15 @@ def send_pending_notifications():
     """Celery task to send pending notifications via FCM and Email."""
     logger.info("START CHECKING PENDING NOTIFICATION")
 
+    if settings.NOTIFICATION_PENDING_EXPIRY_DAYS:
+        # Never expire a notification that is still inside the dispatch window
+        expiry_days = max(settings.NOTIFICATION_PENDING_EXPIRY_DAYS, settings.NOTIFICATION_DISPATCH_DAYS)
+        expired = Notification.objects.filter(status="pending", created_at__lt=now() - timedelta(days=expiry_days)).update(status="failed")
+        if expired:
+            logger.info(f"Marked {expired} pending notifications older than {expiry_days} days as failed.")
+            from .caching import bump_model_versions
+            bump_model_versions(Notification)
+
     service_account_file = os.getenv("FIREBASE_SERVICE_ACCOUNT_FILE")
 
     if not service_account_file:
@@ -35,8 +45,10 @@ def send_pending_notifications():
     
     push_service = FCMNotification(service_account_file=service_account_file, project_id='smms-project-304ac')
 
-    # Fetch all pending notifications
-    pending_notifications = Notification.objects.filter(status="pending")
+    # Fetch pending notifications of the dispatch window (only the newest partitions are read)
+    pending_notifications = Notification.objects.filter(
+        status="pending", created_at__gte=now() - timedelta(days=settings.NOTIFICATION_DISPATCH_DAYS)
+    )
 
     if not pending_notifications.exists():
         logger.info("No pending notifications.")
@@ -104,3 +116,130 @@ def send_pending_notifications():
                     break  # Exit retry loop after reaching max retries
 
     return "Notification processing complete."
+
+
+@shared_task
+def notify_deposit(deposit_id):
+    """Queue top-up notifications for a deposit posted by the payment gateway callback."""
+    from .caching import bump_model_versions
+    from .deposits import deposit_notifications
+
+    deposit = BankDeposit.objects.select_related('control_number__student_or_staff').filter(id=deposit_id).first()
+    if deposit is None:
+        return "Deposit not found."
+
+    notifications = Notification.objects.bulk_create(deposit_notifications(deposit, deposit.control_number))
+    bump_model_versions(Notification)
+    return f"{len(notifications)} deposit notifications queued."
+
+
+@shared_task
+def unblock_recharged_cards():
+    """Reset the insufficient meal counter of cards whose balance is above zero again."""
+    from .scanning import unblock_cards
+
+    reset = unblock_cards()
+    logger.info(f"{reset} recharged cards unblocked.")
+    return f"{reset} recharged cards unblocked."
+
+
+@shared_task
+def take_balance_snapshots():
+    """Store every card's balance at the start of today, see ledger.take_balance_snapshots."""
+    from .ledger import take_balance_snapshots as take_snapshots
+
+    count = take_snapshots()
+    logger.info(f"{count} balance snapshots taken.")
+    return f"{count} balance snapshots taken."
+
+
+@shared_task
+def reconcile_balances():
+    """
+    Compare card balances with the ledger and source records: one reconcile_school task per
+    school, spread over the celery workers, and the report written once they all finished.
+    """
+    from celery import chord
+    from .reconciliation import reconciled_school_ids
+
+    school_ids = [str(school_id) if school_id else None for school_id in reconciled_school_ids()]
+    if not school_ids:
+        # A chord without tasks never calls its callback
+        return write_reconciliation_report([])
+    chord(reconcile_school.s(school_id) for school_id in school_ids)(write_reconciliation_report.s())
+    return len(school_ids)
+
+
+@shared_task(ignore_result=False)
+def reconcile_school(school_id):
+    """(cards checked, discrepancy rows) of one school, see reconciliation.reconcile_school."""
+    from .reconciliation import reconcile_school as reconcile
+
+    return reconcile(school_id)
+
+
+@shared_task
+def write_reconciliation_report(results):
+    from .reconciliation import write_report
+
+    result = write_report(results)
+    if result['discrepancies']:
+        logger.warning(f"{result['discrepancies']} of {result['cards']} card balances disagree, see {result['report']}")
+    else:
+        logger.info(f"All {result['cards']} card balances reconciled.")
+    return result
+
+
+@shared_task
+def manage_partitions():
+    """Pre-create next months' partitions and detach those past retention, see partitions.manage_partitions."""
+    from .partitions import manage_partitions as manage
+
+    report = manage(settings.PARTITION_MONTHS_AHEAD, settings.PARTITION_RETENTION_MONTHS)
+    for table, changes in report.items():
+        if changes['created'] or changes['detached']:
+            logger.info(f"{table}: created {changes['created']}, detached {changes['detached']}")
+    return report
+
+
+@shared_task
+def archive_old_data():
+    """Move scans and notifications past their retention to the archive files, see archive.archive_old_data."""
+    from .archive import archive_old_data as archive
+
+    result = archive()
+    for dataset, count in result.items():
+        if count:
+            logger.info(f"Archived {count} {dataset} rows")
+    return result
+
+
+@shared_task
+def export_analytics():
+    """Write yesterday's transactions, scans, deposits and daily sales as Parquet, see exports.export_analytics."""
+    from .exports import export_analytics as export
+
+    report = export()
+    for day, datasets in report.items():
+        logger.info(f"Analytics export {day}: " + ", ".join(f"{name} {result['rows']} rows" for name, result in datasets.items()))
+    return report
+
+
+@shared_task
+def send_low_balance_reminders():
+    """Remind parents of cards projected to run out in the coming days, see forecasting.send_low_balance_reminders."""
+    from .forecasting import send_low_balance_reminders as remind
+
+    result = remind()
+    logger.info(f"Low balance: {result['at_risk']} of {result['cards']} cards at risk, {result['notifications']} reminders")
+    return result
+
+
+@shared_task
+def forecast_demand():
+    """Precompute tomorrow's expected servings per school, session and item, see forecasting.forecast_demand."""
+    from .forecasting import forecast_demand as forecast
+
+    stored = forecast()
+    logger.info(f"Stored {stored} demand forecasts for tomorrow")
+    return stored
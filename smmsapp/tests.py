@@ -1,3 +1,262 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.db import DataError, transaction as db_transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from smmsproject.celery import app as celery_app
+from . import tasks
+from .deposits import gateway_signature, record_gateway_deposit, credit_deposits, parse_amount, import_statement
+from .ledger import total_balance_at
+from .models import (School, CustomUser, RFIDCard, ParentStudent, CanteenItem, ScanSession, BankDeposit,
+                     BalanceLedger, Notification)
+from .reconciliation import reconcile_school, reconcile_balances
+from .scanning import process_scan, unblock_cards, ScanError, INSUFFICIENT_MEAL_LIMIT, PENALTY_AMOUNT
 
-# Create your tests here.
+WEBHOOK_SECRET = 'test-webhook-secret'
+CALLBACK_URL = '/payments/deposit-callback'
+
+
+def create_card(school, number, balance, role='student', **card_fields):
+    """Card with its opening ledger entry, the way cards are issued."""
+    owner = CustomUser.objects.create(username=f"{role}{number}", first_name='Asha', last_name='Juma', role=role, school=school)
+    card = RFIDCard.objects.create(student_or_staff=owner, card_number=f"CARD{number}", control_number=f"{school.number}2610{number:04d}",
+                                   balance=Decimal(balance), **card_fields)
+    BalanceLedger.objects.create(card=card, entry_type='opening', amount=card.balance)
+    return card
+
+
+def callback_payload(card, reference='GW-0001', amount='2000.00'):
+    return {'reference': reference, 'control_number': card.control_number, 'amount': amount, 'transaction_date': '2026-10-19T08:00:00+03:00'}
+
+
+# ---- PAYMENT GATEWAY CALLBACKS -----
+@override_settings(PAYMENT_WEBHOOK_SECRET=WEBHOOK_SECRET, PAYMENT_GATEWAY_SOURCE='gateway')
+class DepositCallbackTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.school = School.objects.create(name='Mlimani Primary', number=10)
+        self.card = create_card(self.school, 1, '1000.00')
+
+    def post_callback(self, payload, signature=None):
+        body = json.dumps(payload).encode()
+        headers = {} if signature is False else {'HTTP_X_SIGNATURE': signature or gateway_signature(body)}
+        return self.client.post(CALLBACK_URL, body, content_type='application/json', **headers)
+
+    def test_signed_callback_credits_the_card(self):
+        response = self.post_callback(callback_payload(self.card))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['code'], 201)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('3000.00'))
+        deposit = BankDeposit.objects.get(reference='GW-0001')
+        self.assertEqual((deposit.source, deposit.status, deposit.amount), ('gateway', 'processed', Decimal('2000.00')))
+        self.assertTrue(BalanceLedger.objects.filter(card=self.card, entry_type='deposit', deposit=deposit, amount=Decimal('2000.00')).exists())
+
+    def test_rejects_wrong_or_missing_signature(self):
+        payload = callback_payload(self.card)
+        forged = gateway_signature(json.dumps(payload).encode(), secret='not-the-secret')
+
+        for signature in (forged, False):
+            response = self.post_callback(payload, signature=signature)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.data['code'], 401)
+
+        self.assertFalse(BankDeposit.objects.exists())
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1000.00'))
+
+    def test_rejects_every_callback_without_a_configured_secret(self):
+        payload = callback_payload(self.card)
+        signature = gateway_signature(json.dumps(payload).encode(), secret='')
+        with override_settings(PAYMENT_WEBHOOK_SECRET=''):
+            response = self.post_callback(payload, signature=signature)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(BankDeposit.objects.exists())
+
+    def test_rejects_amounts_and_references_that_do_not_fit(self):
+        for payload in (callback_payload(self.card, amount='100000000.00'), callback_payload(self.card, reference='R' * 101)):
+            response = self.post_callback(payload)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(BankDeposit.objects.exists())
+        self.assertIsNone(parse_amount('99999999.999'))
+
+    def test_retry_is_acknowledged_without_crediting_again(self):
+        payload = callback_payload(self.card)
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = self.post_callback(payload)
+            retry = self.post_callback(payload)
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data['message'], "Deposit already processed")
+        self.assertEqual(retry.data['deposit_id'], first.data['deposit_id'])
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('3000.00'))
+        self.assertEqual(BalanceLedger.objects.filter(card=self.card, entry_type='deposit').count(), 1)
+        # Only the first callback queues the deposit notification
+        self.assertEqual(len(callbacks), 1)
+
+    def test_retry_racing_the_first_callback(self):
+        payload = callback_payload(self.card)
+        winner = {}
+
+        def first_callback_commits(value):
+            # The first callback commits after the retry checked for the reference
+            winner['deposit'] = BankDeposit(control_number_id=self.card.control_number, amount=Decimal('2000.00'), source='gateway',
+                                            reference='GW-0001', status='processed', processed_at=timezone.now())
+            with db_transaction.atomic():
+                credit_deposits([winner['deposit']])
+            return parse_amount(value)
+
+        with mock.patch('smmsapp.deposits.parse_amount', side_effect=first_callback_commits):
+            deposit, created = record_gateway_deposit(payload)
+
+        self.assertFalse(created)
+        self.assertEqual(deposit.id, winner['deposit'].id)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('3000.00'))
+        self.assertEqual(BankDeposit.objects.filter(reference='GW-0001').count(), 1)
+        self.assertEqual(BalanceLedger.objects.filter(card=self.card, entry_type='deposit').count(), 1)
+
+
+# ---- BANK STATEMENT IMPORT -----
+class StatementImportTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='Mlimani Primary', number=10)
+        self.card = create_card(self.school, 1, '1000.00')
+
+    def statement(self, *rows):
+        lines = ['control_number,amount,reference,transaction_date'] + [
+            f"{self.card.control_number},{amount},{reference},20261019" for amount, reference in rows
+        ]
+        return io.BytesIO('\n'.join(lines).encode())
+
+    def test_rows_that_do_not_fit_are_reported_per_row(self):
+        result = import_statement(self.statement(('500.00', 'ST-1'), ('100000000.00', 'ST-2'), ('500.00', 'R' * 101)), 'csv')
+
+        self.assertEqual(result['posted'], 1)
+        self.assertEqual([(error['row'], error['code']) for error in result['errors']], [(3, 400), (4, 400)])
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1500.00'))
+
+    def test_a_chunk_failing_in_the_database_is_reported_and_earlier_chunks_stay_posted(self):
+        def overflow_second_chunk(deposits):
+            if deposits[0].reference == 'ST-2':
+                raise DataError('numeric field overflow')
+            return credit_deposits(deposits)
+
+        with mock.patch('smmsapp.deposits.DEPOSIT_CHUNK_SIZE', 1), \
+                mock.patch('smmsapp.deposits.credit_deposits', side_effect=overflow_second_chunk), \
+                self.assertLogs('smmsapp.deposits', 'WARNING'):
+            result = import_statement(self.statement(('500.00', 'ST-1'), ('700.00', 'ST-2')), 'csv')
+
+        self.assertEqual((result['posted'], result['amount']), (1, '500.00'))
+        self.assertEqual([(error['row'], error['code']) for error in result['errors']], [(3, 500)])
+        self.assertEqual(list(BankDeposit.objects.values_list('reference', flat=True)), ['ST-1'])
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1500.00'))
+
+
+# ---- LEDGER AND RECONCILIATION -----
+class LedgerReconciliationTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='Mlimani Primary', number=10)
+        self.card = create_card(self.school, 1, '1000.00')
+        operator = CustomUser.objects.create(username='operator1', role='operator', school=self.school)
+        self.session = ScanSession.objects.create(operator=operator, type='lunch')
+        self.rice = CanteenItem.objects.create(name='Rice', price=Decimal('1500.00'))
+        self.chips = CanteenItem.objects.create(name='Chips', price=Decimal('2000.00'))
+
+    def ledger_balance(self):
+        return BalanceLedger.objects.filter(card=self.card).aggregate(total=Sum('amount'))['total']
+
+    def test_ledger_and_reconciliation_agree_with_the_balance(self):
+        record_gateway_deposit(callback_payload(self.card), source='gateway')
+        process_scan(self.session.id, self.card.card_number, self.rice.id)  # 3000 -> 1500
+        process_scan(self.session.id, self.card.card_number, self.chips.id)  # insufficient: 1500 -> -1000
+
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1500.00') - self.chips.price - PENALTY_AMOUNT)
+        self.assertEqual(self.ledger_balance(), self.card.balance)
+        self.assertEqual(total_balance_at(timezone.now() + timedelta(seconds=1)), self.card.balance)
+        self.assertEqual(reconcile_school(self.school.id), (1, []))
+
+    def test_reconciliation_reports_a_balance_changed_outside_the_ledger(self):
+        record_gateway_deposit(callback_payload(self.card), source='gateway')
+        RFIDCard.objects.filter(id=self.card.id).update(balance=Decimal('9000.00'))
+
+        checked, rows = reconcile_school(self.school.id)
+        self.assertEqual(checked, 1)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['ledger_balance'], rows[0]['expected_balance']), (Decimal('3000.00'), Decimal('3000.00')))
+        self.assertEqual(rows[0]['difference'], Decimal('6000.00'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            report = reconcile_balances(workers=1, output=os.path.join(directory, 'report.csv'))
+            with open(report['report']) as csv_file:
+                self.assertEqual(len(csv_file.readlines()), 2)  # header and the card
+        self.assertEqual((report['cards'], report['discrepancies'], report['total_difference']), (1, 1, '6000.00'))
+
+    def test_nightly_task_reconciles_one_task_per_school(self):
+        other_school = School.objects.create(name='Kilimani Secondary', number=11)
+        other = create_card(other_school, 2, '500.00')
+        RFIDCard.objects.filter(id=other.id).update(balance=Decimal('400.00'))
+        # Run the chord in process
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(MEDIA_ROOT=directory), \
+                mock.patch('smmsapp.tasks.reconcile_school.run', wraps=tasks.reconcile_school.run) as reconcile_task:
+            self.assertEqual(tasks.reconcile_balances(), 2)
+            self.assertEqual(sorted(call.args[0] for call in reconcile_task.call_args_list), sorted([str(self.school.id), str(other_school.id)]))
+            reports = os.listdir(os.path.join(directory, 'reconciliation'))
+            with open(os.path.join(directory, 'reconciliation', reports[0])) as csv_file:
+                lines = csv_file.readlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(other.control_number, lines[1])
+
+
+# ---- UNBLOCK RECHARGED CARDS -----
+class UnblockCardsTests(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='Mlimani Primary', number=10)
+        self.parent = CustomUser.objects.create(username='parent1', role='parent', school=self.school)
+        self.blocked = create_card(self.school, 1, '-5000.00', insufficient_meal_count=INSUFFICIENT_MEAL_LIMIT)
+        ParentStudent.objects.create(parent=self.parent, student=self.blocked.student_or_staff)
+
+    def test_blocked_card_is_refused_until_recharged(self):
+        operator = CustomUser.objects.create(username='operator1', role='operator', school=self.school)
+        session = ScanSession.objects.create(operator=operator, type='lunch')
+        item = CanteenItem.objects.create(name='Rice', price=Decimal('1500.00'))
+
+        with self.assertRaises(ScanError) as refused:
+            process_scan(session.id, self.blocked.card_number, item.id)
+        self.assertEqual(refused.exception.code, 118)
+
+        record_gateway_deposit(callback_payload(self.blocked, amount='10000.00'), source='gateway')
+        self.blocked.refresh_from_db()
+        self.assertEqual((self.blocked.balance, self.blocked.insufficient_meal_count), (Decimal('5000.00'), 0))
+        self.assertTrue(Notification.objects.filter(recipient=self.parent, title="Meal Card Unblocked").exists())
+        process_scan(session.id, self.blocked.card_number, item.id)
+
+    def test_only_cards_back_above_zero_are_reset(self):
+        still_negative = create_card(self.school, 2, '-100.00', insufficient_meal_count=INSUFFICIENT_MEAL_LIMIT)
+        warned = create_card(self.school, 3, '200.00', role='staff', insufficient_meal_count=3)
+        RFIDCard.objects.filter(id=self.blocked.id).update(balance=Decimal('100.00'))
+
+        self.assertEqual(unblock_cards(batch_size=1), 2)
+
+        counts = dict(RFIDCard.objects.values_list('id', 'insufficient_meal_count'))
+        self.assertEqual(counts, {self.blocked.id: 0, still_negative.id: INSUFFICIENT_MEAL_LIMIT, warned.id: 0})
+        # Cards that were not blocked yet are reset without a notification
+        self.assertEqual(list(Notification.objects.values_list('recipient_id', flat=True)), [self.parent.id])
+        self.assertEqual(unblock_cards(), 0)
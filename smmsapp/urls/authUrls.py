@@ -6,6 +6,7 @@ urlpatterns = [
     path('login', LoginView.as_view(), name='login'),
     # path('register', RegisterView.as_view(), name='register'),
     path('create-user',CreateUserView.as_view(), name='create-user'),
+    path('import-users', ImportUsersView.as_view(), name='import-users'),
     path('edit-user',EditUserView.as_view(), name='edit-user'),
     path('activate-deactivate-user', ActivateDeactivateUserView.as_view(), name='activate-deactivate-user'),
     path('logout', LogoutView.as_view(), name='logout'),
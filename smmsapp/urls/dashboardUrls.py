@@ -5,6 +5,7 @@ urlpatterns = [
     path('counts', CountsView.as_view(), name='counts'),
     path('sales-summary', SalesSummaryView.as_view(), name='sales-summary'),
     path('sales-trend', WeeklySalesTrendView.as_view(), name='sales-trend'),
+    path('demand-forecast', DemandForecastView.as_view(), name='demand-forecast'),
     path('end-of-day-report', EndOfDayReportView.as_view(), name='end-of-day-report'),
     path('parent-students', ParentStudentsView.as_view(), name='parent-students'),
     path('staff-view', StaffView.as_view(), name='staff-view'),
@@ -0,0 +1,8 @@
+from django.urls import path
+from ..views.PaymentView import *
+
+urlpatterns = [
+    # Bank deposits
+    path('import-bank-statement', ImportBankStatementView.as_view(), name='import-bank-statement'),
+    path('deposit-callback', DepositCallbackView.as_view(), name='deposit-callback'),
+]
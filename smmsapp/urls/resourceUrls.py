@@ -27,6 +27,7 @@ urlpatterns = [
 
     # Card Urls
     path('create-card', CreateCardView.as_view(), name='create-card'),
+    path('bulk-create-cards', BulkCreateCardView.as_view(), name='bulk-create-cards'),
     path('edit-card', EditCardView.as_view(), name='edit-card'),
     path('card-list/', CardListView.as_view(), name='card-list'),
     path('card-details', CardDetailsView.as_view(), name='card-details'),
@@ -34,5 +35,8 @@ urlpatterns = [
 
     # notifications
     path('notifications/', NotificationListView.as_view(), name='notifications'),
-    path('all-notifications/', AllNotificationsView.as_view(), name='all-notifications')
+    path('all-notifications/', AllNotificationsView.as_view(), name='all-notifications'),
+
+    # Archived scans and notifications
+    path('archive-search', ArchiveSearchView.as_view(), name='archive-search'),
 ]
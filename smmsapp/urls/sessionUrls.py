@@ -1,5 +1,6 @@
 from django.urls import path
 from ..views.SessionView import *
+from ..views.AsyncSessionView import *
 
 urlpatterns = [
     path('start-session', StartScanSessionView.as_view(), name='start-session'),
@@ -9,4 +10,10 @@ urlpatterns = [
     path('scan-card', ScanRFIDCardView.as_view(), name='scan-card'),
     path('scanned-data/', ScannedDataListView.as_view(), name='scanned-data'),
     path('transaction-list/', TransactionListView.as_view(), name='transaction-list'),
+
+    # Async variants, served by the ASGI workers (web-async service)
+    path('async/start-session', AsyncStartScanSessionView.as_view(), name='async-start-session'),
+    path('async/end-session', AsyncEndScanSessionView.as_view(), name='async-end-session'),
+    path('async/active-session', AsyncActiveSessionView.as_view(), name='async-active-session'),
+    path('async/scan-card', AsyncScanRFIDCardView.as_view(), name='async-scan-card'),
 ]
@@ -1,25 +1,31 @@
-from django.utils.timezone import now
+from datetime import timedelta
+from django.utils.timezone import now, localdate
 from io import BytesIO
-from django.db.models import Sum
-from .models import Transaction, RFIDCard, ParentStudent
+from django.db.models import Sum, Count, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.db import transaction as db_transaction
+from .models import Transaction, RFIDCard, ParentStudent, ScannedData, SessionSummary, ControlNumberSequence, Notification
 from weasyprint import HTML
 from django.template.loader import render_to_string
+from .db_routers import use_replica
+from .ledger import day_start, total_balance_at
 
+@use_replica()
 def generate_end_of_day_report():
     buffer = BytesIO()
-    today = now().date()
+    today = localdate()
     
     # Get all successful transactions for today
     transactions = Transaction.objects.none() # make sure to not get null
 
-    transactions |= Transaction.objects.filter(transaction_date__date=today)
+    transactions |= Transaction.objects.filter(transaction_date__gte=day_start(today), transaction_date__lt=day_start(today + timedelta(days=1)))
 
     # Calculate sales data
     total_sales = transactions.aggregate(Sum('amount'))['amount__sum'] or 0
 
-    # Start Balance
+    # Start Balance, from the balance snapshots and ledger
     available_balance = RFIDCard.objects.aggregate(Sum('balance'))['balance__sum'] or 0
-    start_balance = available_balance + total_sales  # Example, modify based on business logic
+    start_balance = total_balance_at(day_start(today))
 
     # Calculate remaining balance
     remaining_balance = available_balance
@@ -40,11 +46,13 @@ def generate_end_of_day_report():
     
     return buffer
 
+@use_replica()
 def generate_parent_end_of_day_report(request):
     buffer = BytesIO()
-    today = now().date()
+    today = localdate()
 
     students = ParentStudent.objects.filter(parent=request.user)
+    todays_transactions = Transaction.objects.filter(transaction_date__gte=day_start(today), transaction_date__lt=day_start(today + timedelta(days=1)))
 
     student_data = []
     total_start_balance = 0
@@ -52,9 +60,10 @@ def generate_parent_end_of_day_report(request):
     total_remaining_balance = 0
 
     for student in students:
-        available_balance = RFIDCard.objects.filter(student=student.student).aggregate(Sum('balance'))['balance__sum'] or 0
-        expenditure = Transaction.objects.filter(transaction_date__date=today, student=student.student).aggregate(Sum('amount'))['amount__sum'] or 0
-        start_balance = available_balance + expenditure
+        cards = RFIDCard.objects.filter(student_or_staff=student.student)
+        available_balance = cards.aggregate(Sum('balance'))['balance__sum'] or 0
+        expenditure = todays_transactions.filter(student_or_staff=student.student).aggregate(Sum('amount'))['amount__sum'] or 0
+        start_balance = total_balance_at(day_start(today), cards=cards)
         remaining_balance = available_balance
 
         student_data.append({
@@ -69,7 +78,7 @@ def generate_parent_end_of_day_report(request):
         total_remaining_balance += remaining_balance
 
     # Get all transactions for today for all children
-    transactions = Transaction.objects.filter(transaction_date__date=today, student__in=[s.student for s in students])
+    transactions = todays_transactions.filter(student_or_staff__in=[s.student for s in students])
     total_debt = transactions.filter(transaction_status="penalt").aggregate(Sum('amount'))['amount__sum'] or 0
 
     # Render the HTML template
@@ -89,3 +98,123 @@ def generate_parent_end_of_day_report(request):
     buffer.seek(0)  # Move buffer cursor to the start
     
     return buffer
+
+
+def build_session_summary(session):
+    """Compute the totals of a finished session and store them in its SessionSummary."""
+    scanned_data = ScannedData.objects.filter(session=session)
+
+    # Totals by item in a single grouped query
+    per_item = scanned_data.values('item_id', 'item__name').annotate(
+        count=Count('id'),
+        revenue=Coalesce(Sum('item__price'), Value(0), output_field=DecimalField()),
+    ).order_by('-count')
+
+    items = [
+        {
+            "item_id": str(row['item_id']) if row['item_id'] else None,
+            "name": row['item__name'],
+            "count": row['count'],
+            "revenue": str(row['revenue']),
+        }
+        for row in per_item
+    ]
+
+    end_at = session.end_at or session.updated_at
+    summary, _ = SessionSummary.objects.update_or_create(
+        session=session,
+        defaults={
+            "total_scans": sum(row['count'] for row in per_item),
+            "total_revenue": sum(row['revenue'] for row in per_item),
+            "penalty_count": Transaction.objects.filter(session=session, transaction_status='penalt').count(),
+            "unique_customers": scanned_data.values('student_or_staff').distinct().count(),
+            "duration": end_at - session.start_at if end_at else None,
+            "items": items,
+        }
+    )
+    return summary
+
+
+def attach_session_totals(sessions):
+    """
+    Set scan_count, revenue and unique_customers on each session. Stored summaries
+    are used when they exist, the remaining sessions share one grouped query.
+    """
+    sessions = list(sessions)
+    pending = []
+
+    for session in sessions:
+        summary = getattr(session, 'summary', None) if session.status == 'completed' else None
+        if summary is not None:
+            session.scan_count = summary.total_scans
+            session.revenue = summary.total_revenue
+            session.unique_customers = summary.unique_customers
+        else:
+            pending.append(session)
+
+    if pending:
+        totals = {
+            row['session']: row
+            for row in ScannedData.objects.filter(session__in=pending).values('session').annotate(
+                scan_count=Count('id'),
+                revenue=Coalesce(Sum('item__price'), Value(0), output_field=DecimalField()),
+                unique_customers=Count('student_or_staff', distinct=True),
+            ).order_by()
+        }
+        for session in pending:
+            row = totals.get(session.id, {})
+            session.scan_count = row.get('scan_count', 0)
+            session.revenue = row.get('revenue', 0)
+            session.unique_customers = row.get('unique_customers', 0)
+
+    return sessions
+
+
+def allocate_control_numbers(school, count=1):
+    """
+    Hand out `count` consecutive control numbers for a school in the current month,
+    formatted {school number}{YY}{MM}{suffix:04d}. The per school/month counter row is
+    locked while it is advanced, so concurrent and bulk issuance never collide.
+    """
+    period = now().strftime('%y%m')
+    prefix = f"{school.number}{period}"
+
+    with db_transaction.atomic():
+        sequence, created = ControlNumberSequence.objects.select_for_update().get_or_create(school=school, period=period)
+        if created:
+            # Continue after the random suffixes issued before the sequence existed. Control numbers
+            # are unique across schools, so every card with the prefix counts (its owner may have moved)
+            existing = RFIDCard.objects.filter(control_number__startswith=prefix).values_list('control_number', flat=True)
+            suffixes = [int(number[len(prefix):]) for number in existing if number[len(prefix):].isdigit()]
+            sequence.last_value = max(suffixes, default=0)
+
+        start = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value'])
+
+    return [f"{prefix}{suffix:04d}" for suffix in range(start, start + count)]
+
+
+def card_created_notifications(rfid, parent_ids=()):
+    """Unsaved notifications announcing a new card, to the student's parents or to the staff member."""
+    owner = rfid.student_or_staff
+    if owner.role == 'student':
+        return [
+            Notification(
+                title=f"{owner.first_name}'s Card Creation",
+                recipient_id=parent_id,
+                message=f"Your {owner.first_name} {owner.last_name}'s meal card is created. \nCard Number: {rfid.card_number}, \nControl Number: {rfid.control_number}, \nBalance: Tsh. {rfid.balance}.",
+                status='pending',
+                type='reminder'
+            )
+            for parent_id in parent_ids
+        ]
+    return [
+        Notification(
+            title=f"Meal Card Creation",
+            recipient=owner,
+            message=f"Your meal card is created. \nCard Number: {rfid.card_number}, \nControl Number: {rfid.control_number}, \nBalance: Tsh. {rfid.balance}.",
+            status='pending',
+            type='reminder'
+        )
+    ]
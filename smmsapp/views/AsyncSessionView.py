@@ -0,0 +1,128 @@
+import json
+from functools import wraps
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from ..authentication import CachedJWTAuthentication
+from ..models import ScanSession
+from ..scanning import process_scan, run_blocking, ScanError
+from ..serializers.SessionSerializers import ScanSessionSerializer, ScannedDataSerializer
+from ..utils import build_session_summary
+
+SESSION_TYPES = {session_type for session_type, _ in ScanSession.SESSION_TYPE_CHOICES}
+
+
+def operator_only(handler):
+    """JWT authentication for the async views, only operators are let through."""
+    @wraps(handler)
+    async def wrapper(view, request, *args, **kwargs):
+        try:
+            result = await run_blocking(CachedJWTAuthentication().authenticate, request)
+        except (InvalidToken, AuthenticationFailed):
+            result = None
+        if result is None:
+            return JsonResponse({'code': 401, 'message': 'Authentication credentials were not provided or are invalid'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        request.user = result[0]
+        if request.user.role != 'operator':
+            return JsonResponse({'code': 403, 'message': 'Only operators can access this'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            request.data = json.loads(request.body or b'{}')
+        except ValueError:
+            request.data = None
+        if not isinstance(request.data, dict):
+            return JsonResponse({'code': 400, 'message': 'Invalid JSON body, expected an object'}, status=status.HTTP_400_BAD_REQUEST)
+        return await handler(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def serialize(serializer_class, instance):
+    return serializer_class(instance).data
+
+
+# --- ASYNC API FOR SCAN RFID CARD -----
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncScanRFIDCardView(View):
+
+    @operator_only
+    async def post(self, request):
+        try:
+            scanned_data = await run_blocking(
+                process_scan,
+                request.data.get('session_id'),
+                request.data.get('card_number'),
+                request.data.get('item_id'),
+            )
+        except ScanError as e:
+            return JsonResponse({'code': e.code, 'message': e.message}, status=e.http_status)
+
+        data = await run_blocking(serialize, ScannedDataSerializer, scanned_data)
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+
+# --- ASYNC API FOR GET ACTIVE SESSION -----
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncActiveSessionView(View):
+
+    @operator_only
+    async def get(self, request):
+        active_session = await ScanSession.objects.filter(operator=request.user, status='active').afirst()
+
+        if active_session:
+            return JsonResponse(ScanSessionSerializer(active_session).data, status=status.HTTP_200_OK)
+        return JsonResponse({'code': 114, 'message': 'No active session available.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+# ---- ASYNC API FOR START SESSION ----
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncStartScanSessionView(View):
+
+    @operator_only
+    async def post(self, request):
+        # Check if an active session already exists for this operator
+        if await ScanSession.objects.filter(operator=request.user, status='active').aexists():
+            return JsonResponse({'code': 113, 'message': 'You already have an active session'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # No type starts the model's default session type
+        session_type = request.data.get('type') or ScanSession._meta.get_field('type').default
+        if not isinstance(session_type, str) or session_type not in SESSION_TYPES:
+            return JsonResponse(
+                {'code': 111, 'message': f"Invalid session type. Use one of: {', '.join(sorted(SESSION_TYPES))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        session = await ScanSession.objects.acreate(operator=request.user, type=session_type)
+        return JsonResponse(ScanSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+# --- ASYNC API FOR END SESSION -----
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncEndScanSessionView(View):
+
+    @operator_only
+    async def post(self, request):
+        try:
+            session = await ScanSession.objects.aget(id=request.data.get('session_id'), operator=request.user, status='active')
+        except (ScanSession.DoesNotExist, ValidationError):
+            return JsonResponse({'code': 114, 'message': 'Active session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        await run_blocking(close_session, session)
+        return JsonResponse(ScanSessionSerializer(session).data, status=status.HTTP_200_OK)
+
+
+def close_session(session):
+    # Close the session and store its totals, completed sessions never change afterwards
+    with db_transaction.atomic():
+        session.status = 'completed'
+        session.end_at = timezone.now()
+        session.save()
+        build_session_summary(session)
@@ -2,14 +2,18 @@ from django.contrib.auth import authenticate
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
 from django.db.models import Q
 import random
 import string
 from ..serializers.AuthSerializers import UserCreateSerializer, AuthUserSerializer, LoginSerializer
 from ..models import CustomUser as User, RFIDCard, Notification
 from ..permissions.CustomPermissions import IsAdminOnly, IsAdminOrParent
+from ..caching import invalidate_cached_user
+from ..bulk import import_users
 
 # Generate JWT tokens for user
 def get_tokens_for_user(user):
@@ -29,17 +33,16 @@ class LoginView(APIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        username = serializer.validated_data['username']
-        password = serializer.validated_data['password']
+        # Resolved by username, email or mobile number in the serializer
+        user = serializer.validated_data['user']
         fcm_token = request.data.get('fcm_token')
 
-        # Check if user exists by username or mobile number
-        user = User.objects.filter(Q(username=username) | Q(mobile_number=username) | Q(email=username)).first()
-        if fcm_token:
-            user.fcm_token = fcm_token
-            user.save()
+        if user:
+            # Only write the push token when the device sent a new one
+            if fcm_token and fcm_token != user.fcm_token:
+                user.fcm_token = fcm_token
+                user.save(update_fields=['fcm_token'])
 
-        if user and user.check_password(password):
             tokens = get_tokens_for_user(user)
             return Response({
                 'refresh': tokens['refresh'],
@@ -68,6 +71,7 @@ class LogoutView(APIView):
 
         try:
             token = RefreshToken(refresh_token)
+            invalidate_cached_user(token[api_settings.USER_ID_CLAIM])
             token.blacklist()
             return Response({"message": "Logged out successfully"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception:
@@ -114,6 +118,35 @@ class CreateUserView(generics.CreateAPIView):
             return Response({"code": 500, "message": f"General System error - {e}"})
 
 
+# Bulk User Import API
+class ImportUsersView(APIView):
+    """Import students, staff and parents from a CSV or JSON lines file in one go."""
+    permission_classes = [IsAdminOnly]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"code": 403, "message": "Access denied. Only can create new users"}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"code": 400, "message": "A CSV or JSONL file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+        try:
+            result = import_users(upload, file_format, dry_run=dry_run)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"code": 400, "message": f"Could not read file - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": f"{result['created']} users imported, {len(result['errors'])} rows rejected",
+            "dry_run": dry_run,
+            **result,
+        }, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+
 # User Edit API
 class EditUserView(generics.UpdateAPIView):
     queryset = User.objects.all()
@@ -1,24 +1,39 @@
+from datetime import date
+from django.core.exceptions import ValidationError
 from django.db.models import Sum, Count
 from django.http import FileResponse
-from django.utils.timezone import now, timedelta
+from django.utils.decorators import method_decorator
+from django.utils.timezone import localdate, timedelta
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.permissions import AllowAny, DjangoModelPermissionsOrAnonReadOnly, IsAuthenticated, IsAdminUser
 
-from ..serializers.ResourceSerializers import FullStudentSerializer, StudentSerializer, FullStaffSerializer
+from ..serializers.ResourceSerializers import FullStudentSerializer, StudentSerializer, FullStaffSerializer, requested_fieldset
 
 from ..utils import generate_end_of_day_report, generate_parent_end_of_day_report
-from ..models import ParentStudent, RFIDCard, Transaction, CustomUser, ScanSession, ScannedData
+from ..caching import cached_response
+from ..db_routers import use_replica
+from ..ledger import day_start
+from ..models import ParentStudent, RFIDCard, Transaction, CustomUser, ScanSession, ScannedData, DemandForecast
 from ..serializers.DashboardSerializer import *
 from ..permissions.CustomPermissions import IsAdminOrParent, IsAdminOnly, IsOperator, IsAdminOrOperator
 
 #  ----- API FOR COUNTS IN DASHBOARD ------
+@method_decorator(use_replica(), name='post')
 class CountsView(APIView):
     permission_classes = [IsAdminOrOperator]
+    cache_timeout = 60
+    cache_scope = 'user'  # operators get their own session totals
+    cache_models = (CustomUser, RFIDCard, Transaction, ScanSession, ScannedData)
 
+    def cache_key_params(self, request):
+        # Today's and this week's totals must not outlive the day they were cached on
+        return {"date": localdate().isoformat()}
+
+    @cached_response
     def post(self, request, *args, **kwargs):
-        today = now().date()
+        today = localdate()
         week_start = today - timedelta(days=today.weekday())  # Get Monday of the current week
         
         total_students = CustomUser.objects.filter(role='student').count()
@@ -38,13 +53,14 @@ class CountsView(APIView):
             # Get total price of items scanned by the operator TODAY
             total_price_today = ScannedData.objects.filter(
                 session__operator=request.user,
-                scanned_at__date=today
+                scanned_at__gte=day_start(today),
+                scanned_at__lt=day_start(today + timedelta(days=1)),
             ).aggregate(total_price=Sum('item__price'))['total_price'] or 0
 
             # Get total price of items scanned by the operator THIS WEEK
             total_price_week = ScannedData.objects.filter(
                 session__operator=request.user,
-                scanned_at__date__gte=week_start  # Get from Monday of this week till today
+                scanned_at__gte=day_start(week_start)  # Get from Monday of this week till today
             ).aggregate(total_price=Sum('item__price'))['total_price'] or 0
             
 
@@ -64,12 +80,21 @@ class CountsView(APIView):
 
 
 # ----- API FOR SALES SUMMARY ------
+@method_decorator(use_replica(), name='post')
 class SalesSummaryView(APIView):
     permission_classes = [IsAdminOnly]
+    cache_timeout = 120
+    cache_scope = 'role'
+    cache_models = (Transaction,)
+
+    def cache_key_params(self, request):
+        # The day, month and year periods start from the local date
+        return {"date": localdate().isoformat()}
 
+    @cached_response
     def post(self, request,  *args, **kwargs):
         filter_type = request.data.get('filter', 'day')  # Default is 'day'
-        today = now().date()
+        today = localdate()
 
         if filter_type == 'day':
             start_date = today
@@ -80,11 +105,13 @@ class SalesSummaryView(APIView):
         else:
             return Response({"error": "Invalid filter. Use 'day', 'month', or 'year'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        total_success = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_status='successful').count()
-        total_penalts = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_status='penalt').count()
-        total_success_amount = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_status='successful') \
+        # A plain range on the partition key, so only the partitions of the period are read
+        transactions = Transaction.objects.filter(transaction_date__gte=day_start(start_date))
+        total_success = transactions.filter(transaction_status='successful').count()
+        total_penalts = transactions.filter(transaction_status='penalt').count()
+        total_success_amount = transactions.filter(transaction_status='successful') \
                                          .aggregate(total_amount=Sum('amount'))['total_amount'] or 0
-        total_penalt_amount = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_status='penalt') \
+        total_penalt_amount = transactions.filter(transaction_status='penalt') \
                                          .aggregate(total_amount=Sum('amount'))['total_amount'] or 0
 
         data = {
@@ -100,14 +127,23 @@ class SalesSummaryView(APIView):
 
 
 # ----- API FOR WEEKLY SALES TRANS --------
+@method_decorator(use_replica(), name='post')
 class WeeklySalesTrendView(APIView):
     permission_classes = [IsAdminOnly]
+    cache_timeout = 300
+    cache_scope = 'role'
+    cache_models = (Transaction,)
 
+    def cache_key_params(self, request):
+        # The 7 days end on the local date
+        return {"date": localdate().isoformat()}
+
+    @cached_response
     def post(self, request,  *args, **kwargs):
-        today = now().date()
+        today = localdate()
         start_date = today - timedelta(days=6)  # Get data for the past 7 days
 
-        sales_data = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_status='successful') \
+        sales_data = Transaction.objects.filter(transaction_date__gte=day_start(start_date), transaction_status='successful') \
                                         .values('transaction_date__date') \
                                         .annotate(sales_amount=Sum('amount')) \
                                         .order_by('transaction_date__date')
@@ -124,6 +160,48 @@ class WeeklySalesTrendView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
+# ----- API FOR MEAL DEMAND FORECAST --------
+class DemandForecastView(APIView):
+    """Expected servings per item and session, precomputed nightly by forecasting.forecast_demand."""
+    permission_classes = [IsAdminOrOperator]
+    cache_timeout = 3600
+    cache_scope = 'user'  # operators only see their own school
+    cache_models = (DemandForecast,)
+
+    def cache_key_params(self, request):
+        # Without a date the response follows the day it is asked on
+        return {} if request.data.get("date") else {"date": self.default_date().isoformat()}
+
+    @staticmethod
+    def default_date():
+        return localdate() + timedelta(days=1)  # Tomorrow
+
+    @cached_response
+    def post(self, request, *args, **kwargs):
+        if request.user.role == 'operator' and not request.user.school_id:
+            return Response({"code": 403, "message": "Access denied. Operator is not assigned to a school."}, status=status.HTTP_403_FORBIDDEN)
+
+        forecast_date = request.data.get("date") or self.default_date().isoformat()
+        try:
+            forecast_date = date.fromisoformat(forecast_date)
+        except (TypeError, ValueError):
+            return Response({"code": 111, "message": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        forecasts = DemandForecast.objects.filter(date=forecast_date).select_related('school', 'item')
+        if request.user.role == 'operator':
+            forecasts = forecasts.filter(school_id=request.user.school_id)
+        elif request.data.get("school"):
+            try:
+                forecasts = forecasts.filter(school_id=request.data.get("school"))
+            except ValidationError:
+                return Response({"code": 111, "message": "Invalid school"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get("session_type"):
+            forecasts = forecasts.filter(session_type=request.data.get("session_type"))
+
+        serializer = DemandForecastSerializer(forecasts.order_by('school__name', 'session_type', '-expected_count'), many=True)
+        return Response({"code": 200, "date": forecast_date, "forecasts": serializer.data}, status=status.HTTP_200_OK)
+
+
 # ---- API FOR GET REPORT --------
 class EndOfDayReportView(APIView):
     """Generate and download End-of-Day report"""
@@ -154,19 +232,25 @@ class LastSessionDetailsView(APIView):
             return Response({"code": 403, "message": "Access denied. Only operators can view this."}, status=status.HTTP_403_FORBIDDEN)
 
         # Get the last session of the operator
-        last_session = ScanSession.objects.filter(operator=request.user).order_by('-start_at').first()
+        last_session = ScanSession.objects.filter(operator=request.user).select_related('summary').order_by('-start_at').first()
 
         if not last_session:
             return Response({"code": 404, "message": "No sessions found for this operator."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all scanned data for the last session
-        scanned_data = ScannedData.objects.filter(session=last_session)
+        # Completed sessions never change, read their stored summary
+        summary = getattr(last_session, 'summary', None)
+        if summary is not None:
+            total_price = summary.total_revenue
+            student_count = summary.unique_customers
+        else:
+            # Get all scanned data for the last session
+            scanned_data = ScannedData.objects.filter(session=last_session)
 
-        # Calculate total price of items in last session
-        total_price = scanned_data.aggregate(Sum('item__price'))['item__price__sum'] or 0
+            # Calculate total price of items in last session
+            total_price = scanned_data.aggregate(Sum('item__price'))['item__price__sum'] or 0
 
-        # Count number of students scanned
-        student_count = scanned_data.values('student_or_staff').distinct().count()
+            # Count number of students scanned
+            student_count = scanned_data.values('student_or_staff').distinct().count()
 
         return Response({
             "session_id": str(last_session.id),
@@ -175,7 +259,9 @@ class LastSessionDetailsView(APIView):
             "start_time": last_session.start_at,
             "end_time": last_session.end_at,
             "total_price": total_price,
-            "student_count": student_count
+            "student_count": student_count,
+            "penalty_count": summary.penalty_count if summary else None,
+            "items": summary.items if summary else None,
         }, status=status.HTTP_200_OK)
     
 
@@ -188,12 +274,15 @@ class ParentStudentsView(APIView):
         if request.user.role != "parent":
             return Response({"code": 403,"message": "Access denied. Only parents can access this."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Get all students linked to the parent
-        parent_students = ParentStudent.objects.filter(parent=request.user)
-        students = [ps.student for ps in parent_students]
+        # Get all students linked to the parent, with their cards, schools, parents and
+        # recent transactions loaded in a fixed number of queries
+        fieldset = requested_fieldset(request)
+        students = FullStudentSerializer.setup_eager_loading(
+            CustomUser.objects.filter(parents__parent=request.user), **fieldset
+        )
 
         # Serialize the student data
-        serializer = FullStudentSerializer(students, many=True)
+        serializer = FullStudentSerializer(students, many=True, **fieldset)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -208,9 +297,10 @@ class StaffView(APIView):
             return Response({"code": 403,"message": "Access denied. Only staff can access this."}, status=status.HTTP_403_FORBIDDEN)
 
         # Get staff
-        staff = request.user
+        fieldset = requested_fieldset(request)
+        staff = FullStaffSerializer.setup_eager_loading(CustomUser.objects.filter(id=request.user.id), **fieldset).get()
 
         # Serialize the student data
-        serializer = FullStaffSerializer(staff)
+        serializer = FullStaffSerializer(staff, **fieldset)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -7,11 +7,15 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, DjangoModelPermissionsOrAnonReadOnly, IsAuthenticated, IsAdminUser
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from ..serializers import *
 from ..models import *
 from ..permissions.CustomPermissions import IsAdminOrParent, IsAdminOnly
+from ..caching import cached_response
+from ..db_routers import use_replica
 
 # --- api to return all active parent
+@method_decorator(use_replica(), name='get')
 class AllParentListView(generics.ListAPIView):
     queryset = CustomUser.objects.filter(role="parent", is_active=True)
     serializer_class = ParentSerializer
@@ -19,6 +23,7 @@ class AllParentListView(generics.ListAPIView):
     page_size = None
 
 #  --- api to return all active students 
+@method_decorator(use_replica(), name='get')
 class AllStudentListView(generics.ListAPIView):
     queryset = CustomUser.objects.filter(role='student', is_active=True)
     serializer_class = StudentSerializer
@@ -26,6 +31,7 @@ class AllStudentListView(generics.ListAPIView):
     page_size = None
     
 #  --- api to return all active staff 
+@method_decorator(use_replica(), name='get')
 class AllStaffListView(generics.ListAPIView):
     queryset = CustomUser.objects.filter(role='staff', is_active=True)
     serializer_class = StaffSerializer
@@ -33,6 +39,7 @@ class AllStaffListView(generics.ListAPIView):
     page_size = None
 
 # --- api to return all cards active
+@method_decorator(use_replica(), name='get')
 class AllCardListView(generics.ListAPIView):
     queryset = RFIDCard.objects.filter(is_active=True)
     serializer_class = RFIDCardSerializer
@@ -40,15 +47,31 @@ class AllCardListView(generics.ListAPIView):
     page_size = None
 
 # --- api to return all school list
+@method_decorator(use_replica(), name='get')
 class AllSchoooListView(generics.ListAPIView):
     queryset = School.objects.all()
     serializer_class = SchoolSerializer
     permission_classes = [IsAuthenticated]
     page_size = None
+    cache_timeout = 3600
+    cache_scope = 'global'
+    cache_models = (School,)
+
+    @cached_response
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 # --- api to return all items
+@method_decorator(use_replica(), name='get')
 class AllCanteenItemView(generics.ListAPIView):
     queryset = CanteenItem.objects.all()
     serializer_class = CanteenItemSerializer
     permission_classes = [IsAuthenticated]
     page_size = None
+    cache_timeout = 3600
+    cache_scope = 'global'
+    cache_models = (CanteenItem,)
+
+    @cached_response
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
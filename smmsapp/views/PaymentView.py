@@ -0,0 +1,70 @@
+import json
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.permissions import AllowAny
+from ..permissions.CustomPermissions import IsAdminOnly
+from ..deposits import import_statement, STATEMENT_FORMATS, verify_gateway_signature, record_gateway_deposit, DepositError
+
+
+# ---- API FOR BANK STATEMENT IMPORT ----
+class ImportBankStatementView(APIView):
+    """Post the deposits of a bank statement (CSV or fixed-width) to the matching cards."""
+    permission_classes = [IsAdminOnly]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"code": 400, "message": "A statement file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'fixed')
+        if file_format not in STATEMENT_FORMATS:
+            return Response({"code": 400, "message": f"Unsupported format: {file_format}. Use 'csv' or 'fixed'."}, status=status.HTTP_400_BAD_REQUEST)
+        source = (request.data.get('source') or 'statement').strip()[:50]
+
+        try:
+            result = import_statement(upload, file_format, source=source)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"code": 400, "message": f"Could not read file - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": f"{result['posted']} deposits posted, {result['duplicates']} already posted, {len(result['errors'])} rows rejected",
+            **result,
+        }, status=status.HTTP_201_CREATED if result['posted'] else status.HTTP_200_OK)
+
+
+# ---- API FOR PAYMENT GATEWAY CALLBACKS ----
+class DepositCallbackView(APIView):
+    """
+    Deposit notification from the payment gateway, authenticated by the HMAC signature of the
+    body. Retries of a reference already posted are acknowledged without crediting again.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        # Sign over the raw bytes, before the body is parsed
+        if not verify_gateway_signature(request.body, request.headers.get('X-Signature')):
+            return Response({"code": 401, "message": "Invalid signature"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return Response({"code": 400, "message": "Body must be a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            deposit, created = record_gateway_deposit(payload)
+        except DepositError as e:
+            return Response({"code": e.code, "message": e.message}, status=e.http_status)
+
+        return Response({
+            "code": 201 if created else 200,
+            "message": "Deposit processed" if created else "Deposit already processed",
+            "deposit_id": deposit.id,
+            "reference": deposit.reference,
+            "processed_at": deposit.processed_at,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -10,6 +10,8 @@ from django.shortcuts import get_object_or_404
 from ..serializers import *
 from ..models import *
 from ..permissions.CustomPermissions import IsAdminOrParent, IsAdminOnly
+from ..bulk import issue_cards
+from ..archive import ARCHIVE_DATASETS, ArchiveCorrupt, archived_months, query_archive
 
 # ----- API FOR GET SCHOOL -----
 class SchoolListView(APIView, PageNumberPagination):
@@ -28,11 +30,11 @@ class SchoolListView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(school, request, view=self)
         if result is not None:
-            serializer =SchoolSerializer(result, many=True)
+            serializer =SchoolSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = SchoolSerializer(school, many=True)
+        serializer = SchoolSerializer(school, many=True, **requested_fieldset(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -85,11 +87,11 @@ class UserListView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(users, request, view=self)
         if result is not None:
-            serializer =UserSerializer(result, many=True)
+            serializer =UserSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = UserSerializer(users, many=True)
+        serializer = UserSerializer(users, many=True, **requested_fieldset(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -110,11 +112,11 @@ class InactiveUserListView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(users, request, view=self)
         if result is not None:
-            serializer =UserSerializer(result, many=True)
+            serializer =UserSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = UserSerializer(users, many=True)
+        serializer = UserSerializer(users, many=True, **requested_fieldset(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
   
 
@@ -138,8 +140,10 @@ class StudentDetailView(generics.RetrieveAPIView):
                 "message": "Student id required"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        student = get_object_or_404(CustomUser, id=student_id, role = 'student')
-        serializer = FullStudentSerializer(student)
+        fieldset = requested_fieldset(request)
+        students = FullStudentSerializer.setup_eager_loading(CustomUser.objects.filter(role='student'), **fieldset)
+        student = get_object_or_404(students, id=student_id)
+        serializer = FullStudentSerializer(student, **fieldset)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -168,8 +172,10 @@ class ParentDetailView(generics.RetrieveAPIView):
                 "message": "Parent id required"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        parent = get_object_or_404(CustomUser, id=parent_id, role = 'parent')
-        serializer = FullParentSerializer(parent)
+        fieldset = requested_fieldset(request)
+        parents = FullParentSerializer.setup_eager_loading(CustomUser.objects.filter(role='parent'), **fieldset)
+        parent = get_object_or_404(parents, id=parent_id)
+        serializer = FullParentSerializer(parent, **fieldset)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -198,8 +204,10 @@ class StaffDetailView(generics.RetrieveAPIView):
                 "message": "Parent id required"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        staff = get_object_or_404(CustomUser, id=staff_id, role = 'staff')
-        serializer = FullStaffSerializer(staff)
+        fieldset = requested_fieldset(request)
+        staffs = FullStaffSerializer.setup_eager_loading(CustomUser.objects.filter(role='staff'), **fieldset)
+        staff = get_object_or_404(staffs, id=staff_id)
+        serializer = FullStaffSerializer(staff, **fieldset)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -228,8 +236,10 @@ class OperatorDetailView(generics.RetrieveAPIView):
                 "message": "Parent id required"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        operator = get_object_or_404(CustomUser, id=operator_id, role = 'operator')
-        serializer = FullOperatorSerializer(operator)
+        operator = get_object_or_404(CustomUser.objects.select_related('school'), id=operator_id, role = 'operator')
+        serializer = FullOperatorSerializer(
+            operator, context={'sessions_page': request.data.get('sessions_page', 1)}, **requested_fieldset(request)
+        )
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -253,7 +263,7 @@ class AdminDetailsView(generics.RetrieveAPIView):
             return Response({"code": 104, "message": "Admin ID required"},status=status.HTTP_400_BAD_REQUEST)
         
         admin = get_object_or_404(CustomUser, id=admin_id, role= 'admin')
-        serializer  = FullAdminSerializer(admin)
+        serializer  = FullAdminSerializer(admin, **requested_fieldset(request))
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -275,11 +285,11 @@ class ItemListView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(item, request, view=self)
         if result is not None:
-            serializer = CanteenItemSerializer(result, many=True)
+            serializer = CanteenItemSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = CanteenItemSerializer(item, many=True)
+        serializer = CanteenItemSerializer(item, many=True, **requested_fieldset(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -378,6 +388,42 @@ class CreateCardView(generics.CreateAPIView):
             return Response({"code": 500, "message": f"General System error - {e}"},status=status.HTTP_400_BAD_REQUEST)
 
 
+# ---- API FOR BULK CARD ISSUANCE ----
+class BulkCreateCardView(APIView):
+    """Issue many cards in one request: {"cards": [{"student_or_staff", "card_number", "balance", "issued_date"}, ...]}"""
+    permission_classes = [IsAdminOnly]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"code": 403, "message": "Access denied. Only can create new users"}, status=status.HTTP_403_FORBIDDEN)
+
+        entries = request.data.get('cards')
+        if not isinstance(entries, list) or not entries:
+            return Response({"code": 400, "message": "cards must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Field validation per entry, entries with invalid fields are reported and skipped
+        errors = []
+        valid = []
+        for index, entry in enumerate(entries):
+            serializer = BulkRFIDCardEntrySerializer(data=entry)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'code': 400, 'message': serializer.errors})
+
+        cards, issue_errors = issue_cards([data for _, data in valid])
+        # Map positions in the valid list back to positions in the request
+        errors += [{**error, 'index': valid[error['index']][0]} for error in issue_errors]
+        errors.sort(key=lambda error: error['index'])
+
+        return Response({
+            "message": f"{len(cards)} cards created, {len(errors)} rejected",
+            "created": len(cards),
+            "cards": [{"id": card.id, "card_number": card.card_number, "control_number": card.control_number} for card in cards],
+            "errors": errors,
+        }, status=status.HTTP_201_CREATED if cards else status.HTTP_400_BAD_REQUEST)
+
+
 # ---- API FOR EDIT CARD DETAILS ----  
 class EditCardView(generics.UpdateAPIView):
     queryset = RFIDCard.objects.all()
@@ -454,11 +500,11 @@ class CardListView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(card, request, view=self)
         if result is not None:
-            serializer = RFIDCardSerializer(result, many=True)
+            serializer = RFIDCardSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = RFIDCardSerializer(card, many=True)
+        serializer = RFIDCardSerializer(card, many=True, **requested_fieldset(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -481,7 +527,7 @@ class CardDetailsView(generics.RetrieveAPIView):
             return Response({"code": 104, "message": "Card ID required"},status=status.HTTP_400_BAD_REQUEST)
         
         card = get_object_or_404(RFIDCard, id=card_id, role= 'admin')
-        serializer  = RFIDCardSerializer(card)
+        serializer  = RFIDCardSerializer(card, **requested_fieldset(request))
 
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -532,7 +578,7 @@ class NotificationListView(APIView):
 
     def post(self, request):
         notifications = Notification.objects.filter(recipient=request.user).order_by('-created_at')[:100]
-        serializer = NotificationSerializer(notifications, many=True)
+        serializer = NotificationSerializer(notifications, many=True, **requested_fieldset(request))
         return Response(serializer.data)
     
 
@@ -553,9 +599,52 @@ class AllNotificationsView(APIView, PageNumberPagination):
         # Apply pagination
         result = self.paginate_queryset(notifications, request, view=self)
         if result is not None:
-            serializer = NotificationSerializer(result, many=True)
+            serializer = NotificationSerializer(result, many=True, **requested_fieldset(request))
             return self.get_paginated_response(serializer.data)
 
         # If fail return all data/fields
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        serializer = NotificationSerializer(notifications, many=True, **requested_fieldset(request))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# ---- API TO SEARCH ARCHIVED SCANS AND NOTIFICATIONS (read only) -----
+class ArchiveSearchView(APIView):
+    permission_classes = [IsAdminOnly]
+    page_size = 50
+
+    def post(self, request, *args, **kwargs):
+        dataset = request.data.get("dataset")
+        month = request.data.get("month")  # YYYY-MM, omit to list the archived months
+        filters = request.data.get("filters") or {}  # exact field matches, e.g. {"student_or_staff_id": "..."}
+
+        if dataset not in ARCHIVE_DATASETS:
+            return Response(
+                {"code": 111, "message": f"Invalid dataset. Use one of: {', '.join(ARCHIVE_DATASETS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not month:
+            return Response({"code": 200, "dataset": dataset, "months": archived_months(dataset)}, status=status.HTTP_200_OK)
+        if not isinstance(filters, dict):
+            return Response({"code": 111, "message": "filters must be an object of field: value"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = max(int(request.data.get("page", 1)), 1)
+        except (TypeError, ValueError):
+            return Response({"code": 111, "message": "page must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            count, rows = query_archive(dataset, month, filters, offset=(page - 1) * self.page_size, limit=self.page_size)
+        except FileNotFoundError as e:
+            return Response({"code": 404, "message": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except ArchiveCorrupt as e:
+            return Response({"code": 500, "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            "code": 200,
+            "dataset": dataset,
+            "month": month,
+            "count": count,
+            "page": page,
+            "page_size": self.page_size,
+            "results": rows,
+        }, status=status.HTTP_200_OK)
@@ -3,9 +3,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.views import APIView
+from django.db import transaction as db_transaction
 from django.db.models import Q
 from ..models import *
-from ..serializers.SessionSerializers import ScanSessionSerializer, ScannedDataSerializer, TransactionSerializer
+from ..serializers.SessionSerializers import ScanSessionSerializer, ScannedDataSerializer, TransactionSerializer, SessionHistorySerializer
+from ..utils import build_session_summary, attach_session_totals
+from ..scanning import process_scan, ScanError
 from django.utils import timezone
 from ..permissions.CustomPermissions import IsAdminOrOperator, IsOperator, IsAdminOrParent, IsAdminOnly
 
@@ -20,94 +23,14 @@ class ScanRFIDCardView(APIView):
         if user.role != 'operator':
             return Response({'code': 403, 'message': 'Only operators can scan cards'}, status=status.HTTP_403_FORBIDDEN)
 
-        session_id = request.data.get('session_id')
-        card_number = request.data.get('card_number')
-        item_id = request.data.get('item_id')
-
-        # Validate session
-        try:
-            session = ScanSession.objects.get(id=session_id, status='active')
-        except ScanSession.DoesNotExist:
-            return Response({'code': 114, 'message': 'Active session not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        # Validate RFID Card
         try:
-            rfid_card = RFIDCard.objects.get(card_number=card_number, is_active=True)
-            student_or_staff = rfid_card.student_or_staff
-        except RFIDCard.DoesNotExist:
-            return Response({'code': 115, 'message': 'Invalid or inactive RFID card'}, status=status.HTTP_404_NOT_FOUND)
-
-        # Validate Canteen Item
-        try:
-            item = CanteenItem.objects.get(id=item_id)
-        except CanteenItem.DoesNotExist:
-            return Response({'code': 116, 'message': 'Invalid canteen item'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if student already purchase the item on same session
-        if ScannedData.objects.filter(session=session, student_or_staff=student_or_staff, rfid_card=rfid_card, item=item).exists():
-            return Response({'code': 119, "message": "Already purchase this item"}, status=status.HTTP_400_BAD_REQUEST)
-
-       # Check if student has exceeded 10 insufficient meals
-        if rfid_card.insufficient_meal_count >= 10:
-            if student_or_staff.role == 'student':
-                title = f"{student_or_staff.first_name}'s Card Blocked"
-                message = f"Your child {student_or_staff.first_name} does not get meal today because insuficient balance execeeded 10 times, Please recharge for your child to get a meal. Available Balance is {rfid_card.balance}"
-            else: 
-                title: f"Your Card Blocked"
-                message = f"Your card is blocked as you get penalt 10 times after insuficient balance in your account. Please recharge your account to unblock"
-            return Response({'code': 118, 'message': 'Meal denied. Customer exceeded allowed insufficient meals.'}, status=status.HTTP_403_FORBIDDEN)
-
-        # Deduct balance if sufficient funds
-        if rfid_card.balance >= item.price:
-            rfid_card.balance -= item.price
-            trans_status = 'successful'
-            title = f"Transaction Report"
-            if student_or_staff.role == 'student':
-                message = f"Your child {student_or_staff.first_name} purchased {item.name} with price {item.price}. The available balance is {rfid_card.balance}"
-            else:
-                message = f"You purchased {item.name} with price {item.price}. The available balance is {rfid_card.balance}. If is not you contact with our support imidietly"
-        else:
-            # Allow the meal but apply penalty (-500)
-            rfid_card.balance -= (item.price + 500)  
-            rfid_card.insufficient_meal_count += 1
-            trans_status = 'penalt'
-            title = f"WARNING: Transaction Penalt"
-            if student_or_staff.role == 'stundent':
-                message = f"Your child {student_or_staff.first_name} has purchase {item.name} with price {item.price} and penalt of -500 Tsh.Available Balance is {rfid_card.balance}. \nWarning: Count left {rfid_card.insufficient_meal_count}/10 before your child's card blocked, Please recharge to avoid further penalts"
-            else:
-                message = f"Your purchase {item.name} with price {item.price} and penalt of -500 Tsh.Available Balance is {rfid_card.balance}. \nWarning: Count left {rfid_card.insufficient_meal_count}/10 before your card blocked, Please recharge to avoid further penalts"
-
-
-        rfid_card.save()
-
-        # Store scanned data
-        scanned_data = ScannedData.objects.create(
-            session=session,
-            student_or_staff=student_or_staff,
-            rfid_card=rfid_card,
-            item=item
-        )
-
-        # Log transaction
-        transaction = Transaction.objects.create(
-            student_or_staff=student_or_staff,
-            rfid_card=rfid_card,
-            item=item,
-            amount=item.price if rfid_card.balance >= item.price else (item.price + 500),
-            transaction_status = trans_status
-        )
-
-        # Notify parent
-        parents = ParentStudent.objects.filter(student=student_or_staff)
-        for parent_entry in parents:
-            Notification.objects.create(
-                title=title,
-                recipient=parent_entry.parent,
-                transaction=transaction,
-                message=message,
-                status='pending',
-                type='transaction'
+            scanned_data = process_scan(
+                request.data.get('session_id'),
+                request.data.get('card_number'),
+                request.data.get('item_id'),
             )
+        except ScanError as e:
+            return Response({'code': e.code, 'message': e.message}, status=e.http_status)
 
         # Return response
         serializer = ScannedDataSerializer(scanned_data)
@@ -170,9 +93,12 @@ class EndScanSessionView(APIView):
             except ScanSession.DoesNotExist:
                 return Response({'code': 114, 'message': 'Active session not found'}, status=status.HTTP_404_NOT_FOUND)
 
-            session.status = 'completed'
-            session.end_at = timezone.now()
-            session.save()
+            # Close the session and store its totals, completed sessions never change afterwards
+            with db_transaction.atomic():
+                session.status = 'completed'
+                session.end_at = timezone.now()
+                session.save()
+                build_session_summary(session)
 
             serializer = ScanSessionSerializer(session)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -188,14 +114,14 @@ class SessionListView(APIView):
         user = request.user
 
         if user.role == 'operator':
-            session = ScanSession.objects.filter(operator=user).order_by('status', '-start_at')[:10]
+            session = ScanSession.objects.filter(operator=user).select_related('summary').order_by('status', '-start_at')[:10]
         elif user.role == 'admin':
-            session = ScanSession.objects.all().order_by('status', '-start_at')[:20]
+            session = ScanSession.objects.all().select_related('summary').order_by('status', '-start_at')[:20]
         else:
             return Response({'code': 403, 'message': 'Only operators can end a session'}, status=status.HTTP_403_FORBIDDEN)
 
         # If fail return all data/fields
-        serializer = ScanSessionSerializer(session, many=True)
+        serializer = SessionHistorySerializer(attach_session_totals(session), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
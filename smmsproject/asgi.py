@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smmsproject.settings')
 
-application = get_asgi_application()
+# Set up Django before importing consumers, they import models
+django_asgi_app = get_asgi_application()
+
+from smmsapp.routing import websocket_urlpatterns  # noqa: E402
+
+# Terminals authenticate with a token in their first frame (no cookies), so there is no
+# cross-site risk for an Origin check to guard against and native clients send no Origin.
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': URLRouter(websocket_urlpatterns),
+})
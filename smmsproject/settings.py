@@ -77,14 +77,65 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')  
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+# Results are only kept for tasks that ask for them (ignore_result=False), e.g. the per school
+# reconciliation tasks whose results the report callback collects
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_IGNORE_RESULT = True
 
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# ---- CACHE (Redis, shared by all web and celery processes) ----
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'smms',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            # Fail fast so views fall back to the database when Redis is down
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+        },
+    }
+}
+
 CELERY_BEAT_SCHEDULE = {
     "send-pending-notifications": {
         "task": "smmsapp.tasks.send_pending_notifications",
         "schedule": crontab(minute="*/5"),  # Run every 5 minutes
     },
+    "unblock-recharged-cards": {
+        "task": "smmsapp.tasks.unblock_recharged_cards",
+        "schedule": crontab(minute="*/15"),  # Catches balances restored outside deposits (e.g. card edits)
+    },
+    "take-balance-snapshots": {
+        "task": "smmsapp.tasks.take_balance_snapshots",
+        "schedule": crontab(minute=5, hour=0),  # Just after midnight, snapshots are of the start of the day
+    },
+    "reconcile-balances": {
+        "task": "smmsapp.tasks.reconcile_balances",
+        "schedule": crontab(minute=30, hour=1),  # Nightly, outside canteen hours
+    },
+    "manage-partitions": {
+        "task": "smmsapp.tasks.manage_partitions",
+        "schedule": crontab(minute=15, hour=0),  # Daily, creating a missing month is idempotent
+    },
+    "archive-old-data": {
+        "task": "smmsapp.tasks.archive_old_data",
+        "schedule": crontab(minute=0, hour=2),  # Nightly, after reconciliation
+    },
+    "export-analytics": {
+        "task": "smmsapp.tasks.export_analytics",
+        "schedule": crontab(minute=30, hour=2),  # Nightly, exports yesterday
+    },
+    "send-low-balance-reminders": {
+        "task": "smmsapp.tasks.send_low_balance_reminders",
+        "schedule": crontab(minute=0, hour=18),  # Evening, parents can recharge before the next school day
+    },
+    "forecast-demand": {
+        "task": "smmsapp.tasks.forecast_demand",
+        "schedule": crontab(minute=0, hour=3),  # Nightly, kitchens read tomorrow's forecast in the morning
+    },
 }
 
 
@@ -107,6 +158,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'smmsapp.middleware.CompressionMiddleware.CompressionMiddleware',  # Brotli/gzip for API and PDF responses
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -115,6 +167,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# ---- RESPONSE COMPRESSION ----
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes, smaller responses are sent as is
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))  # 0-11, 5 keeps CPU cost close to gzip
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))  # 1-9
+
 ROOT_URLCONF = 'smmsproject.urls'
 
 TEMPLATES = [
@@ -136,6 +193,12 @@ TEMPLATES = [
 WSGI_APPLICATION = 'smmsproject.wsgi.application'
 
 # ----- DATABASE PRODUCTION -----
+# DB_POOL chooses how connections are reused:
+#   persistent - every gunicorn thread / celery process keeps its connection for DB_CONN_MAX_AGE seconds (default)
+#   pgbouncer  - DB_HOST/DB_PORT point at PgBouncer in transaction pooling mode (docker compose --profile pooling)
+#   none       - a new connection for every request and task
+DB_POOL = os.getenv('DB_POOL', 'persistent')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -144,9 +207,37 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', '123456789'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL == 'none' else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,  # Drop dead persistent connections before reusing them
     }
 }
 
+if DB_POOL == 'pgbouncer':
+    # Server-side cursors (.iterator()) do not survive transaction pooling
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# ----- READ REPLICA -----
+# Dashboard, list and report reads opt in with smmsapp.db_routers.use_replica.
+# Without DB_REPLICA_HOST everything reads from the primary.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', '5432'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['smmsapp.db_routers.ReplicaRouter']
+
+# Threads each ASGI worker uses for blocking work in the async scan endpoints
+# (each thread may hold one database connection)
+ASYNC_SCAN_THREADS = int(os.getenv('ASYNC_SCAN_THREADS', '8'))
+
+# ----- WEBSOCKET SCAN CHANNEL (smmsapp/consumers.py) -----
+ASGI_APPLICATION = 'smmsproject.asgi.application'
+# Seconds a terminal has to send its auth frame after connecting
+SCAN_SOCKET_AUTH_TIMEOUT = int(os.getenv('SCAN_SOCKET_AUTH_TIMEOUT', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -173,7 +264,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'smmsapp.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5
@@ -188,6 +279,53 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Seconds an authenticated user stays cached by CachedJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+
+# Processes hashing passwords during bulk user imports (smmsapp/bulk.py)
+IMPORT_HASH_WORKERS = int(os.getenv('IMPORT_HASH_WORKERS', os.cpu_count() or 2))
+
+# Processes reconciling balances, one school at a time, for manage.py reconcile_balances
+# (the nightly task spreads the schools over the celery workers instead)
+RECONCILE_WORKERS = int(os.getenv('RECONCILE_WORKERS', os.cpu_count() or 2))
+
+# Monthly partitions of transactions, scanned data and notifications (PostgreSQL, smmsapp/partitions.py):
+# months created ahead of time, and months kept attached (0 keeps every month)
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+PARTITION_RETENTION_MONTHS = int(os.getenv('PARTITION_RETENTION_MONTHS', '0'))
+
+# Pending notifications older than this many days are no longer sent
+NOTIFICATION_DISPATCH_DAYS = int(os.getenv('NOTIFICATION_DISPATCH_DAYS', '7'))
+# Opt-in: pending notifications older than this many days (at least NOTIFICATION_DISPATCH_DAYS)
+# are marked failed, so they leave the pending state and can be archived (0 = keep them pending)
+NOTIFICATION_PENDING_EXPIRY_DAYS = int(os.getenv('NOTIFICATION_PENDING_EXPIRY_DAYS', '0'))
+
+# Retention (smmsapp/archive.py): scans and sent/failed notifications older than this many
+# days are moved to gzip JSON lines files under ARCHIVE_ROOT (0 keeps them in the database)
+ARCHIVE_ROOT = os.getenv('ARCHIVE_ROOT', os.path.join(BASE_DIR, "archive"))
+SCANNED_DATA_RETENTION_DAYS = int(os.getenv('SCANNED_DATA_RETENTION_DAYS', '365'))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '5000'))  # rows moved per transaction
+
+# Nightly Parquet export for analytics (smmsapp/exports.py), one file per dataset, day and school
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', os.path.join(BASE_DIR, "exports"))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '50000'))  # rows read per round trip, one row group each
+EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'zstd')  # zstd, snappy, gzip or none
+
+# Low balance reminders (smmsapp/forecasting.py): cards projected to go negative within the
+# horizon, from their weekday spend over the lookback, are reminded at most once per N days
+LOW_BALANCE_HORIZON_DAYS = int(os.getenv('LOW_BALANCE_HORIZON_DAYS', '5'))
+LOW_BALANCE_LOOKBACK_WEEKS = int(os.getenv('LOW_BALANCE_LOOKBACK_WEEKS', '4'))
+LOW_BALANCE_REMINDER_DAYS = int(os.getenv('LOW_BALANCE_REMINDER_DAYS', '3'))
+
+# Weeks of scans the nightly meal demand forecast averages per weekday (smmsapp/forecasting.py)
+DEMAND_LOOKBACK_WEEKS = int(os.getenv('DEMAND_LOOKBACK_WEEKS', '8'))
+
+# Payment gateway deposit callbacks (POST /payments/deposit-callback), signed with
+# HMAC-SHA256 of the body in X-Signature. Callbacks are refused while the secret is unset.
+PAYMENT_WEBHOOK_SECRET = os.getenv('PAYMENT_WEBHOOK_SECRET', '')
+PAYMENT_GATEWAY_SOURCE = os.getenv('PAYMENT_GATEWAY_SOURCE', 'gateway')
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -28,4 +28,5 @@ urlpatterns = [
     path('resources/', include("smmsapp.urls.resourceUrls")),
     path('sessions/', include("smmsapp.urls.sessionUrls")),
     path('list/',include("smmsapp.urls.listUrls")),
+    path('payments/', include("smmsapp.urls.paymentUrls")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)